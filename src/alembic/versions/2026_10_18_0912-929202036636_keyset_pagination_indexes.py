@@ -0,0 +1,52 @@
+"""keyset pagination indexes
+
+Revision ID: 929202036636
+Revises: cb2c67efa291
+Create Date: 2026-10-18 09:12:41.318207
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "929202036636"
+down_revision: Union[str, None] = "cb2c67efa291"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+KEYSET_INDEXES = {
+    "ix_books_created_at_id": ["created_at", "id"],
+    "ix_books_published_year_id": ["published_year", "id"],
+    "ix_books_title_id": ["title", "id"],
+    "ix_books_updated_at_id": ["updated_at", "id"],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction and doesn't
+    # block writes. If a build fails, drop the INVALID index it leaves
+    # behind before re-running the upgrade.
+    with op.get_context().autocommit_block():
+        for name, columns in KEYSET_INDEXES.items():
+            op.create_index(
+                name,
+                "books",
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name in reversed(list(KEYSET_INDEXES)):
+            op.drop_index(
+                name, table_name="books", postgresql_concurrently=True
+            )
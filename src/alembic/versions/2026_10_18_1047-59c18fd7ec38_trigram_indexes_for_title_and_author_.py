@@ -0,0 +1,52 @@
+"""trigram indexes for title and author name search
+
+Revision ID: 59c18fd7ec38
+Revises: 929202036636
+Create Date: 2026-10-18 10:47:13.552904
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "59c18fd7ec38"
+down_revision: Union[str, None] = "929202036636"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TRGM_INDEXES = {
+    "ix_books_title_trgm": ("books", "title"),
+    "ix_authors_name_trgm": ("authors", "name"),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction and doesn't
+    # block writes. If a build fails, drop the INVALID index it leaves
+    # behind before re-running the upgrade.
+    with op.get_context().autocommit_block():
+        for name, (table, column) in TRGM_INDEXES.items():
+            op.create_index(
+                name,
+                table,
+                [column],
+                unique=False,
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # the pg_trgm extension is left installed, other objects may rely on it
+    with op.get_context().autocommit_block():
+        for name, (table, _) in reversed(list(TRGM_INDEXES.items())):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
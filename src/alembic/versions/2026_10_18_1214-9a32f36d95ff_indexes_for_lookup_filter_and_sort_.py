@@ -0,0 +1,64 @@
+"""indexes for lookup, filter and sort columns
+
+Revision ID: 9a32f36d95ff
+Revises: 5bef7ffdbc5f
+Create Date: 2026-10-18 12:14:38.902551
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9a32f36d95ff"
+down_revision: Union[str, None] = "5bef7ffdbc5f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BOOK_INDEXES = {
+    "ix_books_author_id_id": ["author_id", "id"],
+    "ix_books_genre_id": ["genre", "id"],
+    "ix_books_genre_published_year_id": ["genre", "published_year", "id"],
+    "ix_books_genre_created_at_id": ["genre", "created_at", "id"],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction and doesn't
+    # block writes. If a build fails, drop the INVALID index it leaves
+    # behind before re-running the upgrade.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_authors_email",
+            "authors",
+            ["email"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        for name, columns in BOOK_INDEXES.items():
+            op.create_index(
+                name,
+                "books",
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name in reversed(list(BOOK_INDEXES)):
+            op.drop_index(
+                name, table_name="books", postgresql_concurrently=True
+            )
+        op.drop_index(
+            "ix_authors_email",
+            table_name="authors",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,74 @@
+"""pending file deletions and file_path index
+
+Revision ID: d41c7a9e2b63
+Revises: 9a32f36d95ff
+Create Date: 2026-10-18 14:02:17.408316
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d41c7a9e2b63"
+down_revision: Union[str, None] = "9a32f36d95ff"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "pending_file_deletions",
+        sa.Column("file_path", sa.String(length=255), nullable=False),
+        sa.Column(
+            "attempts", sa.Integer(), server_default="0", nullable=False
+        ),
+        sa.Column(
+            "available_at",
+            sa.TIMESTAMP(),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.Column(
+            "created_at",
+            sa.TIMESTAMP(),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_pending_file_deletions_available_at_id",
+        "pending_file_deletions",
+        ["available_at", "id"],
+        unique=False,
+    )
+    # see 9a32f36d95ff: CONCURRENTLY doesn't block writes to books
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_books_file_path",
+            "books",
+            ["file_path"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_books_file_path",
+            table_name="books",
+            postgresql_concurrently=True,
+        )
+    op.drop_index(
+        "ix_pending_file_deletions_available_at_id",
+        table_name="pending_file_deletions",
+    )
+    op.drop_table("pending_file_deletions")
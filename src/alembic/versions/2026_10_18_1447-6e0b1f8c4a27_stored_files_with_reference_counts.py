@@ -0,0 +1,57 @@
+"""stored files with reference counts
+
+Revision ID: 6e0b1f8c4a27
+Revises: d41c7a9e2b63
+Create Date: 2026-10-18 14:47:51.226094
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from constants import FILE_DELETION_DELAY_MINUTES
+from database.triggers import BOOK_FILE_REFS_TRIGGER, book_file_refs_function
+
+
+# revision identifiers, used by Alembic.
+revision: str = "6e0b1f8c4a27"
+down_revision: Union[str, None] = "d41c7a9e2b63"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "stored_files",
+        sa.Column("file_path", sa.String(length=255), nullable=False),
+        sa.Column(
+            "ref_count", sa.Integer(), server_default="0", nullable=False
+        ),
+        sa.Column(
+            "created_at",
+            sa.TIMESTAMP(),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("file_path"),
+    )
+    # existing books keep their keys, they are counted like any other
+    op.execute(
+        "INSERT INTO stored_files (file_path, ref_count) "
+        "SELECT file_path, count(*) FROM books "
+        "WHERE file_path <> '' GROUP BY file_path"
+    )
+    op.execute(book_file_refs_function(FILE_DELETION_DELAY_MINUTES))
+    op.execute(BOOK_FILE_REFS_TRIGGER)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER books_file_refs ON books")
+    op.execute("DROP FUNCTION books_file_refs()")
+    op.drop_table("stored_files")
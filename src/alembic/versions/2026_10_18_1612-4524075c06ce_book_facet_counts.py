@@ -0,0 +1,59 @@
+"""book facet counts
+
+Revision ID: 4524075c06ce
+Revises: 6e0b1f8c4a27
+Create Date: 2026-10-18 16:12:08.419530
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from database.triggers import (
+    BOOK_FACET_COUNTS_FUNCTION,
+    BOOK_FACET_COUNTS_TRIGGERS,
+)
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4524075c06ce"
+down_revision: Union[str, None] = "6e0b1f8c4a27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "book_facet_counts",
+        sa.Column("facet", sa.String(length=32), nullable=False),
+        sa.Column("value", sa.String(length=255), nullable=False),
+        sa.Column(
+            "count", sa.BigInteger(), server_default="0", nullable=False
+        ),
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("facet", "value"),
+    )
+    # the existing catalog is counted once, the triggers keep it current
+    op.execute(
+        "INSERT INTO book_facet_counts (facet, value, count) "
+        "SELECT f.facet, f.value, count(*) FROM books AS b, "
+        "LATERAL (VALUES ('genre', b.genre::text), "
+        "('published_year', b.published_year::text), "
+        "('author', b.author_id::text)) AS f (facet, value) "
+        "GROUP BY f.facet, f.value"
+    )
+    op.execute(BOOK_FACET_COUNTS_FUNCTION)
+    for trigger in BOOK_FACET_COUNTS_TRIGGERS.values():
+        op.execute(trigger)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in BOOK_FACET_COUNTS_TRIGGERS:
+        op.execute(f"DROP TRIGGER {name} ON books")
+    op.execute("DROP FUNCTION books_facet_counts()")
+    op.drop_table("book_facet_counts")
@@ -1,6 +1,6 @@
 from datetime import timedelta
-from constants import ACCESS_TOKEN_TYPE, REFRESH_TOKEN_TYPE, TOKEN_TYPE_FIELD
-from schemas.auth_schemas import UserIn
+from constants import ACCESS_TOKEN_TYPE, REFRESH_TOKEN_TYPE, TOKEN_TYPE_FIELD, USER_ID_FIELD
+from schemas.auth_schemas import UserIn, UserOut
 from auth.utils import encode_jwt
 from config import settings
 
@@ -20,9 +20,10 @@ def create_jwt(
     )
 
 
-def create_access_token(user: UserIn) -> str:
+def create_access_token(user: UserOut) -> str:
     jwt_payload = {
         "sub": user.email,
+        USER_ID_FIELD: user.id,
         "name": user.name,
         "email": user.email,
         # "logged_in_at"
@@ -0,0 +1,66 @@
+import base64
+import hashlib
+import json
+from typing import Dict, Optional, Sequence
+
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey, RSAPublicKey
+from cryptography.hazmat.primitives.serialization import load_pem_private_key, load_pem_public_key
+from jwt import InvalidTokenError
+from jwt.algorithms import RSAAlgorithm
+
+from config import settings
+
+
+def jwk_thumbprint(public_key: RSAPublicKey) -> str:
+    """RFC 7638 thumbprint, a stable kid that changes only with the key itself."""
+    jwk = RSAAlgorithm.to_jwk(public_key, as_dict=True)
+    canonical = json.dumps({"e": jwk["e"], "kty": jwk["kty"], "n": jwk["n"]}, separators=(",", ":"), sort_keys=True)
+    digest = hashlib.sha256(canonical.encode()).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+class KeySet:
+    """
+        Signing key and verification keys parsed once, verification keys are looked up by kid.
+        Keeping the previous public keys lets tokens signed before a rotation stay valid until they expire.
+    """
+
+    def __init__(self, private_key_pem: str, public_key_pem: str, previous_public_key_pems: Sequence[str] = ()):
+        self.private_key: RSAPrivateKey = load_pem_private_key(private_key_pem.encode(), password=None)
+        self.public_key: RSAPublicKey = load_pem_public_key(public_key_pem.encode())
+        self.kid = jwk_thumbprint(self.public_key)
+
+        self.public_keys: Dict[str, RSAPublicKey] = {self.kid: self.public_key}
+        for pem in previous_public_key_pems:
+            key = load_pem_public_key(pem.encode())
+            self.public_keys.setdefault(jwk_thumbprint(key), key)
+
+    def get_public_key(self, kid: Optional[str]) -> RSAPublicKey:
+        # tokens issued before kid headers were added were signed with the current key
+        if kid is None:
+            return self.public_key
+        try:
+            return self.public_keys[kid]
+        except KeyError:
+            raise InvalidTokenError(f"Unknown signing key: {kid}")
+
+    def jwks(self) -> dict:
+        """The verification keys as a JSON Web Key Set."""
+        return {
+            "keys": [
+                {
+                    **RSAAlgorithm.to_jwk(key, as_dict=True),
+                    "kid": kid,
+                    "use": "sig",
+                    "alg": settings.algorithm,
+                }
+                for kid, key in self.public_keys.items()
+            ]
+        }
+
+
+key_set = KeySet(
+    private_key_pem=settings.private_key,
+    public_key_pem=settings.public_key,
+    previous_public_key_pems=settings.previous_public_keys,
+)
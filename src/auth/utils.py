@@ -1,13 +1,29 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import time
 import uuid
 import bcrypt
 import jwt
+from auth.keys import key_set
 from config import settings
+from utils.ttl_cache import TTLCache
+
+
+# token -> verified payload, so a repeated bearer token skips the RS256 verification
+token_cache = TTLCache(maxsize=settings.token_cache_size, ttl=0)
+
+# bcrypt takes ~100-300 ms of CPU per call (and releases the GIL), the bounded pool
+# keeps a login burst from blocking the event loop or starving the default executor
+bcrypt_executor = ThreadPoolExecutor(
+    max_workers=settings.bcrypt_max_workers,
+    thread_name_prefix="bcrypt",
+)
 
 
 def encode_jwt(
     payload: dict,
-    private_key: str = settings.private_key,
+    private_key=key_set.private_key,
     algorithm: str = settings.algorithm,
     expire_minutes: int = settings.access_token_expire_minutes,
     expire_timedelta: timedelta | None = None,
@@ -28,36 +44,57 @@ def encode_jwt(
         to_encode,
         private_key,
         algorithm=algorithm,
+        headers={"kid": key_set.kid},
     )
     return encoded
 
 
 def decode_jwt(
     token: str | bytes,
-    public_key: str = settings.public_key,
+    public_key=None,
     algorithm: str = settings.algorithm,
 ) -> dict:
+    """Verifies the token with the key named by its kid header (or the given key)."""
+    if public_key is None and (payload := token_cache.get(token)):
+        return payload
+
     decoded = jwt.decode(
         token,
-        public_key,
+        public_key or key_set.get_public_key(jwt.get_unverified_header(token).get("kid")),
         algorithms=[algorithm],
     )
+    if public_key is None and "exp" in decoded:
+        # never outlive the token itself
+        token_cache.set(token, decoded, ttl=decoded["exp"] - time.time())
     return decoded
 
 
-def hash_password(
+async def hash_password(
     password: str,
+    rounds: int = settings.bcrypt_rounds,
 ) -> bytes:
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=rounds)
     pwd_bytes: bytes = password.encode()
-    return bcrypt.hashpw(password=pwd_bytes, salt=salt)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(bcrypt_executor, bcrypt.hashpw, pwd_bytes, salt)
 
 
-def validate_password(
+async def validate_password(
     password: str,
     hashed_password: bytes
 ) -> bool:
-    return bcrypt.checkpw(
-        password=password.encode(),
-        hashed_password=hashed_password
-    )
\ No newline at end of file
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        bcrypt_executor, bcrypt.checkpw, password.encode(), hashed_password
+    )
+
+
+def password_needs_rehash(
+    hashed_password: bytes,
+    rounds: int = settings.bcrypt_rounds,
+) -> bool:
+    """Checks the cost factor stored in the hash ($2b$<cost>$...) against the configured one"""
+    try:
+        return int(hashed_password.split(b"$")[2]) != rounds
+    except (IndexError, ValueError):
+        return True
\ No newline at end of file
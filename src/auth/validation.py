@@ -3,20 +3,28 @@ from fastapi import Depends, Form
 from fastapi.security import OAuth2PasswordBearer
 from jwt import InvalidTokenError
 from auth.utils import (
+    hash_password,
+    password_needs_rehash,
     validate_password,
     decode_jwt
 )
-from constants import ACCESS_TOKEN_TYPE, REFRESH_TOKEN_TYPE, TOKEN_TYPE_FIELD
+from config import settings
+from constants import ACCESS_TOKEN_TYPE, REFRESH_TOKEN_TYPE, TOKEN_TYPE_FIELD, USER_ID_FIELD
 from database import session_getter
 from repositories.user_repository import UserRepository
-from schemas.auth_schemas import UserOut
+from schemas.auth_schemas import TokenUser, UserOut
 from custom_exceptions.auth_exceptions import (
     UnauthedUserException,
+    UserUpdateException,
     InvalidTokenTypeException,
     TokenNotFoundException,
     InvalidTokenErrorException,
 )
 from sqlalchemy.ext.asyncio import AsyncSession
+from utils.ttl_cache import TTLCache
+
+# users by email, for the routes that need the full record
+user_cache = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl_seconds)
 
 # interface for entering name and password, and then automatically getting token and sending it in headers
 oauth2_scheme = OAuth2PasswordBearer(
@@ -38,12 +46,24 @@ async def validate_auth_user(
     ):
         raise UnauthedUserException()
 
-    if not validate_password(
+    if not await validate_password(
         password=password,
         hashed_password=user.password_hash,
     ):
         raise UnauthedUserException()
 
+    # the configured bcrypt cost changed, upgrade the stored hash while the password is at hand
+    if password_needs_rehash(user.password_hash):
+        try:
+            await user_repo.update_password_hash(
+                session=session,
+                user_id=user.id,
+                password_hash=await hash_password(password),
+            )
+        except UserUpdateException:
+            # not a reason to refuse the login, it is retried on the next one
+            pass
+
     return user
 
 async def validate_token_type(
@@ -80,17 +100,38 @@ async def get_user_by_token_sub(
     if email is None:
         raise TokenNotFoundException()
 
+    if user := user_cache.get(email):
+        return user
+
     user: UserOut | None = await user_repo.get_user_by_email(
         session=session, 
         email=email
     )
     
     if user:
+        user_cache.set(email, user)
         return user
 
     raise TokenNotFoundException()
 
 
+async def get_user_by_token_claims(
+    payload: dict,
+    user_repo: UserRepository,
+    session: AsyncSession
+) -> TokenUser | UserOut:
+    """Getting a user from the token claims, tokens issued without the id claim fall back to the lookup"""
+    user_id = payload.get(USER_ID_FIELD)
+
+    if not settings.auth_user_from_claims or user_id is None:
+        return await get_user_by_token_sub(payload, user_repo, session)
+
+    try:
+        return TokenUser(id=user_id, name=payload.get("name"), email=payload.get("sub"))
+    except ValueError:
+        raise TokenNotFoundException()
+
+
 # factory for creating functions (inputs the token type that is expected)
 def get_auth_user_from_token_of_type(token_type: str):
     # Function to get information from a token
@@ -107,6 +148,16 @@ def get_auth_user_from_token_of_type(token_type: str):
     return get_auth_user_from_token
 
 
+async def get_current_token_user(
+    payload: Annotated[dict, Depends(get_current_token_payload)],
+    user_repo: Annotated[UserRepository, Depends(UserRepository)],
+    session: Annotated[AsyncSession, Depends(session_getter)],
+) -> TokenUser | UserOut:
+    """Access token user without a database round trip, enough for the routes that only need the id"""
+    await validate_token_type(payload=payload, token_type=ACCESS_TOKEN_TYPE)
+    return await get_user_by_token_claims(payload, user_repo, session)
+
+
 # Check that the user is authenticated to issue an access token
 get_current_auth_user = get_auth_user_from_token_of_type(token_type=ACCESS_TOKEN_TYPE)
 # Check that the user is authenticated to issue a refresh token
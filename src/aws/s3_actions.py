@@ -1,5 +1,20 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, List, Optional, Sequence
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from fastapi import HTTPException, UploadFile
-from custom_exceptions.file_exceptions import DeletionFileException, NoFileFoundException, UnexpectedFileError, UploadingFileException
+from fastapi.concurrency import run_in_threadpool
+from constants import DOWNLOAD_CHUNK_SIZE, FILE_CONTENT_ENCODINGS, S3_DELETE_BATCH_SIZE, UPLOAD_PART_SIZE
+from custom_exceptions.file_exceptions import (
+    DeletionFileException,
+    NoFileFoundException,
+    RangeNotSatisfiableException,
+    UnexpectedFileError,
+    UploadingFileException,
+)
+from utils.compression_funcs import get_compressor
 from utils.mixins.file_action import FileActionMixin
 import boto3
 from config import settings
@@ -22,59 +37,238 @@ class S3Service(FileActionMixin):
         self.s3 = boto3.resource(
             's3',
             aws_access_key_id=aws_access_key,
-            aws_secret_access_key=aws_secret_key
+            aws_secret_access_key=aws_secret_key,
+            config=Config(
+                signature_version="s3v4",
+                max_pool_connections=settings.s3_max_pool_connections,
+                connect_timeout=settings.s3_connect_timeout,
+                read_timeout=settings.s3_read_timeout,
+                retries={"total_max_attempts": settings.s3_max_attempts, "mode": settings.s3_retry_mode},
+            ),
         )
         self.bucket = self.s3.Bucket(self.AWS_BUCKET_NAME)
+        # boto3 is blocking, its calls run in a dedicated bounded pool instead of on the event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.s3_max_workers, thread_name_prefix="s3"
+        )
         self.initialized = True
 
+    async def _run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
     async def s3_upload_file(self, file: UploadFile | None, key: str) -> None:
+        """
+            Uploads the file part by part, so memory is bounded by UPLOAD_PART_SIZE and not by the file size.
+            Types listed in FILE_CONTENT_ENCODINGS are compressed on the way and stored with that Content-Encoding.
+        """
         try:
             if not file:
                 raise NoFileFoundException()
             
-            contents = await file.read()
             file_type = self.get_file_type(file.filename)
-            self.validate_file_size(len(contents), file_type)
+            # the size of the spooled upload is known up front, reject it before any S3 request
+            if file.size is not None:
+                self.validate_file_size(file.size, file_type)
+
+            encoding = FILE_CONTENT_ENCODINGS.get(file_type)
+            object_params = {"ContentEncoding": encoding} if encoding else {}
+
+            await file.seek(0)
+            parts = self._iter_upload_parts(file, file_type, encoding)
+            first_part = await anext(parts, b"")
+            second_part = await anext(parts, None)
+            if second_part is None:
+                # small files fit into one request, a multipart upload would only add round trips
+                s3_object = await self._run(self.bucket.put_object, Key=key, Body=first_part, **object_params)
+                if not s3_object:
+                    raise UploadingFileException(f'Error during uploading file {file.filename}! (problem on s3 side)')
+                return
 
-            s3_object = self.bucket.put_object(Key=key, Body=contents)
-            if not s3_object:
-                raise UploadingFileException(f'Error during uploading file {file.filename}! (problem on s3 side)')
+            await self._s3_multipart_upload(key, self._chain_parts((first_part, second_part), parts), object_params)
             
         except HTTPException:
             raise
         except Exception as e:
             raise UnexpectedFileError(f'Error during file upload: {str(e)}')
 
+    async def _iter_upload_parts(
+        self, file: UploadFile, file_type: str, encoding: Optional[str]
+    ) -> AsyncIterator[bytes]:
+        """
+            Yields the (compressed) file in UPLOAD_PART_SIZE parts, only the last one may be smaller.
+            The size limit applies to the original bytes and is checked while reading.
+        """
+        compressor = get_compressor(encoding) if encoding else None
+        read_size, buffer = 0, bytearray()
+        while chunk := await file.read(UPLOAD_PART_SIZE):
+            read_size += len(chunk)
+            self.validate_file_size(read_size, file_type)
+            if compressor is None:
+                yield chunk
+                continue
+
+            buffer += await run_in_threadpool(compressor.compress, chunk)
+            while len(buffer) >= UPLOAD_PART_SIZE:
+                yield bytes(buffer[:UPLOAD_PART_SIZE])
+                del buffer[:UPLOAD_PART_SIZE]
+
+        if compressor is not None:
+            buffer += compressor.flush()
+            for start in range(0, len(buffer), UPLOAD_PART_SIZE):
+                yield bytes(buffer[start:start + UPLOAD_PART_SIZE])
+
+    @staticmethod
+    async def _chain_parts(head: Sequence[bytes], rest: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        for part in head:
+            yield part
+        async for part in rest:
+            yield part
+
+    async def _s3_multipart_upload(self, key: str, parts: AsyncIterator[bytes], object_params: dict) -> None:
+        """Streams the parts as a multipart upload, aborting it when reading a part fails (e.g. the size limit)."""
+        client = self.s3.meta.client
+        multipart_upload = await self._run(
+            client.create_multipart_upload, Bucket=self.AWS_BUCKET_NAME, Key=key, **object_params
+        )
+        upload_id = multipart_upload["UploadId"]
 
-    async def s3_delete_file(self, key: str) -> None:
         try:
-            response = self.bucket.delete_objects(
-                Delete={'Objects': [{'Key': key}]}
+            uploaded_parts = []
+            async for part in parts:
+                part_number = len(uploaded_parts) + 1
+                response = await self._run(
+                    client.upload_part,
+                    Bucket=self.AWS_BUCKET_NAME,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=part,
+                )
+                uploaded_parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+            await self._run(
+                client.complete_multipart_upload,
+                Bucket=self.AWS_BUCKET_NAME,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": uploaded_parts},
+            )
+        except Exception:
+            # uploaded parts are billed until the upload is aborted
+            await self._run(
+                client.abort_multipart_upload, Bucket=self.AWS_BUCKET_NAME, Key=key, UploadId=upload_id
             )
-            if response['ResponseMetadata']['HTTPStatusCode'] != 200:
-                raise DeletionFileException(f'Error during deletion file {key}')
+            raise
+
+    async def s3_delete_file(self, key: str) -> None:
+        if await self.s3_delete_files([key]):
+            raise DeletionFileException(f'Error during deletion file {key}')
+
+    async def s3_delete_files(self, keys: Sequence[str]) -> List[str]:
+        """One delete_objects call per S3_DELETE_BATCH_SIZE keys, returns the keys S3 failed to delete."""
+        failed = []
+        try:
+            for start in range(0, len(keys), S3_DELETE_BATCH_SIZE):
+                batch = keys[start:start + S3_DELETE_BATCH_SIZE]
+                response = await self._run(
+                    self.bucket.delete_objects,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                )
+                if response['ResponseMetadata']['HTTPStatusCode'] != 200:
+                    raise DeletionFileException(f'Error during deletion files {", ".join(batch)}')
+                # quiet mode lists only the keys that failed
+                failed.extend(error['Key'] for error in response.get('Errors', []))
+            return failed
 
         except HTTPException:
             raise
         except Exception as e:
             raise UnexpectedFileError(f'Error during file deletion: {str(e)}')
 
-    async def s3_download_file(self, key: str) -> bytes:
+    async def s3_list_files(self, prefix: str, page_size: int = S3_DELETE_BATCH_SIZE) -> AsyncIterator[List[dict]]:
+        """Yields the bucket listing page by page ('Key', 'LastModified', ...), never the whole listing."""
+        pages = iter(self.s3.meta.client.get_paginator("list_objects_v2").paginate(
+            Bucket=self.AWS_BUCKET_NAME,
+            Prefix=prefix,
+            PaginationConfig={"PageSize": page_size},
+        ))
+        try:
+            while page := await self._run(next, pages, None):
+                if contents := page.get("Contents"):
+                    yield contents
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise UnexpectedFileError(f'Error listing files: {str(e)}')
+
+    async def s3_open_file(self, key: str, byte_range: str | None = None) -> dict[str, Any]:
+        """
+            Starts a (ranged) GET of the object without reading its body.
+            The response holds 'Body' plus 'ContentLength', 'ContentEncoding' for compressed objects
+            and, for ranges, 'ContentRange'.
+        """
+        params = {"Bucket": self.AWS_BUCKET_NAME, "Key": key}
+        if byte_range:
+            params["Range"] = byte_range
         try:
-            return self.s3.Object(
-                bucket_name=self.AWS_BUCKET_NAME,
-                key=key
-            ).get()['Body'].read()
+            return await self._run(self.s3.meta.client.get_object, **params)
+        except ClientError as e:
+            error = e.response.get("Error", {})
+            if error.get("Code") == "InvalidRange":
+                object_size = error.get("ActualObjectSize")
+                raise RangeNotSatisfiableException(object_size=int(object_size) if object_size else None)
+            if error.get("Code") in ("NoSuchKey", "404"):
+                raise NoFileFoundException(f'File {key} not found')
+            raise UnexpectedFileError(f'Error downloading file: {str(e)}')
         except Exception as e:
             raise UnexpectedFileError(f'Error downloading file: {str(e)}')
 
-    async def s3_update_file(self, old_key: str, new_key: str, new_file: UploadFile):
+    async def iter_file_body(self, body, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Yields the object body chunk by chunk, releasing the connection when the client goes away."""
+        try:
+            while chunk := await self._run(body.read, chunk_size):
+                yield chunk
+        finally:
+            body.close()
+
+    async def s3_head_file(self, key: str) -> dict[str, Any]:
         try:
-            await self.s3_delete_file(old_key)
-            await self.s3_upload_file(new_file, new_key)
+            return await self._run(self.s3.meta.client.head_object, Bucket=self.AWS_BUCKET_NAME, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                raise NoFileFoundException(f'File {key} not found')
+            raise UnexpectedFileError(f'Error reading file metadata: {str(e)}')
         except Exception as e:
-            raise UnexpectedFileError(f'Error updating file: {str(e)}')
-        
+            raise UnexpectedFileError(f'Error reading file metadata: {str(e)}')
+
+    async def s3_file_exists(self, key: str) -> bool:
+        try:
+            await self.s3_head_file(key)
+            return True
+        except NoFileFoundException:
+            return False
+
+    def s3_presigned_upload_url(self, key: str, content_type: str, expires_in: int) -> str:
+        """URL the client PUTs the file to directly, the Content-Type header is part of the signature."""
+        # signing is local, no request is made
+        return self.s3.meta.client.generate_presigned_url(
+            "put_object",
+            Params={"Bucket": self.AWS_BUCKET_NAME, "Key": key, "ContentType": content_type},
+            ExpiresIn=expires_in,
+        )
+
+    def s3_presigned_download_url(self, key: str, file_name: str, expires_in: int) -> str:
+        return self.s3.meta.client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.AWS_BUCKET_NAME,
+                "Key": key,
+                "ResponseContentDisposition": f"attachment;filename={file_name}",
+            },
+            ExpiresIn=expires_in,
+        )
+
 
 s3_client = S3Service(
     aws_access_key=settings.aws_access_key_id,
@@ -0,0 +1,61 @@
+"""
+Per-request cost of access token verification: PEM string on every call
+(the previous decode_jwt), pre-parsed key object, and the verified-token cache.
+
+Run from the src directory (no database needed):
+    python -m benchmarks.auth_benchmark --runs 2000
+"""
+import argparse
+import statistics
+import time
+
+import jwt
+
+from auth.keys import key_set
+from auth.utils import decode_jwt, encode_jwt, token_cache
+from config import settings
+from constants import ACCESS_TOKEN_TYPE, TOKEN_TYPE_FIELD
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def measure(name: str, runs: int, func) -> None:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1_000_000)
+    print(
+        f"{name:<28} p50={statistics.median(samples):9.1f} us  "
+        f"p95={percentile(samples, 0.95):9.1f} us  max={max(samples):9.1f} us"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=2000)
+    args = parser.parse_args()
+
+    token = encode_jwt({TOKEN_TYPE_FIELD: ACCESS_TOKEN_TYPE, "sub": "benchmark@example.com", "uid": 1})
+    print(f"runs per case: {args.runs}")
+
+    measure(
+        "PEM string (before)",
+        args.runs,
+        lambda: jwt.decode(token, settings.public_key, algorithms=[settings.algorithm]),
+    )
+    measure(
+        "pre-parsed key",
+        args.runs,
+        lambda: jwt.decode(token, key_set.public_key, algorithms=[settings.algorithm]),
+    )
+    token_cache.clear()
+    measure("decode_jwt (cached)", args.runs, lambda: decode_jwt(token))
+    measure("encode_jwt", args.runs, lambda: encode_jwt({"sub": "benchmark@example.com"}))
+
+
+if __name__ == "__main__":
+    main()
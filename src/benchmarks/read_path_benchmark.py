@@ -0,0 +1,88 @@
+"""
+CPU time and memory per list page: the ORM path (Book and Author instances in the
+identity map) vs the Core read path (column select mapped into tuple records),
+both serialized to the response bytes.
+
+Run from the src directory against a disposable database:
+    python -m benchmarks.read_path_benchmark --seed 100000 --runs 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+
+from sqlalchemy import text
+
+from benchmarks.search_benchmark import seed
+from database import session_factory
+from database.database import engine
+from repositories.book_repository import BookRepository
+from schemas.validation_schemas import BookFilterParams, BookSortParams
+from utils.serialization_funcs import books_to_json
+
+
+PAGE_SIZES = (100, 1_000, 10_000)
+
+
+async def measure(name: str, runs: int, limit: int, query_func) -> None:
+    wall, cpu = [], []
+    for _ in range(runs):
+        # a fresh session per page, as a request gets
+        async with session_factory() as session:
+            wall_started, cpu_started = time.perf_counter(), time.process_time()
+            books_to_json(await query_func(session, limit))
+            wall.append((time.perf_counter() - wall_started) * 1000)
+            cpu.append((time.process_time() - cpu_started) * 1000)
+
+    async with session_factory() as session:
+        tracemalloc.start()
+        books = await query_func(session, limit)
+        books_to_json(books)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    print(
+        f"  {name:<12} wall p50={statistics.median(wall):8.2f} ms  "
+        f"cpu p50={statistics.median(cpu):8.2f} ms  "
+        f"cpu per row={statistics.median(cpu) / max(len(books), 1) * 1000:6.2f} us  "
+        f"peak memory={peak / 1024:9.1f} KB"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seed", type=int, default=0, help="number of books to generate first")
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.seed:
+        await seed(args.seed)
+
+    async with session_factory() as session:
+        total = (await session.execute(text("SELECT count(*) FROM books"))).scalar_one()
+    print(f"books: {total}, runs per case: {args.runs}")
+
+    for limit in PAGE_SIZES:
+        print(f"page of {limit}")
+        await measure(
+            "ORM",
+            args.runs,
+            limit,
+            lambda session, limit: BookRepository.get_books(
+                session, BookFilterParams(), BookSortParams(), limit=limit
+            ),
+        )
+        await measure(
+            "Core",
+            args.runs,
+            limit,
+            lambda session, limit: BookRepository.get_book_records(
+                session, BookFilterParams(), BookSortParams(), limit=limit
+            ),
+        )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
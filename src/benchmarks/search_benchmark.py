@@ -0,0 +1,100 @@
+"""
+Latency of the leading-wildcard title filter vs the trigram similarity search.
+
+Run from the src directory against a disposable database:
+    python -m benchmarks.search_benchmark --seed 2000000 --runs 200
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from sqlalchemy import text
+
+from database import session_factory
+from database.database import engine
+from repositories.book_repository import BookRepository
+from schemas.validation_schemas import BookFilterParams, BookSortParams
+
+
+WORDS = ["dragon", "empire", "garden", "winter", "shadow", "river", "castle", "ocean"]
+# exact words, substrings and typos
+QUERIES = ["dragon", "empi", "gardn", "wintr", "shadow river", "castel", "ocea"]
+
+
+async def seed(rows: int) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            "INSERT INTO authors (name, email, password_hash) "
+            "VALUES ('Benchmark Author', 'benchmark@example.com', '\\x00') "
+            "ON CONFLICT (name) DO NOTHING"
+        ))
+        author_id = (await conn.execute(
+            text("SELECT id FROM authors WHERE name = 'Benchmark Author'")
+        )).scalar_one()
+        await conn.execute(
+            text(
+                "INSERT INTO books (title, file_path, published_year, genre, author_id) "
+                "SELECT initcap((:words)[1 + i % 8] || ' ' || (:words)[1 + (i / 8) % 8]) "
+                "       || ' ' || substr(md5(i::text), 1, 8), "
+                "       'books/benchmark_' || i, 1801 + i % 220, "
+                "       (enum_range(NULL::genreenum))[1 + i % 8], :author_id "
+                "FROM generate_series(1, :rows) AS i"
+            ),
+            {"words": WORDS, "rows": rows, "author_id": author_id},
+        )
+        await conn.execute(text("ANALYZE books"))
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def measure(name: str, runs: int, query_func) -> None:
+    samples = []
+    async with session_factory() as session:
+        for _ in range(runs):
+            search = random.choice(QUERIES)
+            started = time.perf_counter()
+            await query_func(session, search)
+            samples.append((time.perf_counter() - started) * 1000)
+    print(
+        f"{name:<28} p50={statistics.median(samples):8.2f} ms  "
+        f"p95={percentile(samples, 0.95):8.2f} ms  max={max(samples):8.2f} ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seed", type=int, default=0, help="number of books to generate first")
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.seed:
+        await seed(args.seed)
+
+    async with session_factory() as session:
+        total = (await session.execute(text("SELECT count(*) FROM books"))).scalar_one()
+    print(f"books: {total}, runs per case: {args.runs}")
+
+    await measure(
+        "ILIKE filter (get_books)",
+        args.runs,
+        lambda session, search: BookRepository.get_books(
+            session, BookFilterParams(title=search), BookSortParams()
+        ),
+    )
+    await measure(
+        "trigram search",
+        args.runs,
+        lambda session, search: BookRepository.search_books(
+            session, search, BookFilterParams()
+        ),
+    )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+"""
+Per-row cost of turning a page of ORM books into response bytes: the response_model
+path (validation, then stdlib json), validate + dump_json (the previous list path)
+and the orjson fast path.
+
+Run from the src directory (no database needed):
+    python -m benchmarks.serialization_benchmark --runs 20
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from pydantic import TypeAdapter
+
+from database.models import Author, Book
+from schemas.book_schemas import BookSchema
+from utils.enums import GenreEnum
+from utils.serialization_funcs import books_to_json
+
+
+PAGE_SIZES = (100, 1_000, 10_000)
+
+book_list_adapter = TypeAdapter(List[BookSchema])
+
+
+def make_books(count: int) -> List[Book]:
+    author = Author(id=1, name="Benchmark Author", created_at=datetime(2024, 1, 1))
+    genres = list(GenreEnum)
+    started = datetime(2024, 1, 1, 12, 0, 0, 123456)
+    return [
+        Book(
+            id=book_id,
+            title=f"Benchmark Book {book_id}",
+            file_path=f"books/{book_id:064x}.pdf",
+            published_year=1900 + book_id % 120,
+            genre=genres[book_id % len(genres)],
+            author_id=author.id,
+            author=author,
+            created_at=started + timedelta(seconds=book_id),
+            updated_at=started + timedelta(seconds=book_id),
+        )
+        for book_id in range(1, count + 1)
+    ]
+
+
+def response_model_path(books: List[Book]) -> bytes:
+    # what FastAPI does for response_model=List[BookSchema] with JSONResponse
+    books = book_list_adapter.validate_python(books, from_attributes=True)
+    content = book_list_adapter.dump_python(books, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def dump_json_path(books: List[Book]) -> bytes:
+    return book_list_adapter.dump_json(book_list_adapter.validate_python(books, from_attributes=True))
+
+
+def measure(name: str, runs: int, books: List[Book], func) -> None:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func(books)
+        samples.append(time.perf_counter() - started)
+    median = statistics.median(samples)
+    print(f"  {name:<24} page={median * 1000:9.2f} ms  per row={median / len(books) * 1_000_000:7.2f} us")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"runs per case: {args.runs}")
+    for page_size in PAGE_SIZES:
+        books = make_books(page_size)
+        # all paths produce the same bytes, only the cost differs
+        assert books_to_json(books) == dump_json_path(books)
+        print(f"{page_size} books")
+        measure("response_model (before)", args.runs, books, response_model_path)
+        measure("validate + dump_json", args.runs, books, dump_json_path)
+        measure("orjson fast path", args.runs, books, books_to_json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+from .book_cache import book_cache
+from .list_cache import list_cache
+from .redis_client import redis_client
+
+__all__ = (
+    "book_cache",
+    "list_cache",
+    "redis_client"
+)
\ No newline at end of file
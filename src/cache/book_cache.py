@@ -0,0 +1,204 @@
+import asyncio
+import logging
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from cache.redis_client import delete_by_pattern, redis_client
+from config import settings
+from schemas.book_schemas import BookSchema
+
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "book_cache"
+STATS_KEY = f"{KEY_PREFIX}:stats"
+POPULAR_KEY = f"{KEY_PREFIX}:popular"
+# stored for ids that don't exist, so repeated misses don't reach Postgres
+MISSING = b""
+
+# GET + hit/miss counter + popularity in a single round trip, the version guards the fill after a miss
+LOOKUP_SCRIPT = """
+local value = redis.call('GET', KEYS[1])
+redis.call('HINCRBY', KEYS[2], value and 'hits' or 'misses', 1)
+if value and value ~= '' then
+    redis.call('ZINCRBY', KEYS[3], 1, ARGV[1])
+end
+return {value, redis.call('GET', KEYS[4]) or '0'}
+"""
+
+# stores the entry only if the book wasn't invalidated since the version was read,
+# otherwise a fill that read the database before a write could cache the old row after it
+FILL_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+
+def book_key(book_id: int) -> str:
+    return f"{KEY_PREFIX}:book:{book_id}"
+
+
+def version_key(book_id: int) -> str:
+    return f"{KEY_PREFIX}:version:{book_id}"
+
+
+class BookLookup(NamedTuple):
+    cached: bool
+    # None for a cached missing id
+    book: Optional[BookSchema]
+    # pass it to set/set_missing after a miss, None if Redis is unavailable
+    version: Optional[int]
+
+
+class BookCache:
+    """
+        Read-through cache of serialized BookSchema by id.
+        Redis errors are logged and treated as a miss, the database stays the source of truth.
+    """
+
+    def __init__(self, redis: Redis, ttl: int, missing_ttl: int):
+        self.redis = redis
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        self._lookup = redis.register_script(LOOKUP_SCRIPT)
+        self._fill = redis.register_script(FILL_SCRIPT)
+
+    async def get(self, book_id: int) -> BookLookup:
+        """A cached missing id gives cached=True with no book."""
+        try:
+            value, version = await self._lookup(
+                keys=[book_key(book_id), STATS_KEY, POPULAR_KEY, version_key(book_id)], args=[book_id]
+            )
+        except RedisError as e:
+            logger.warning("Book cache lookup failed: %s", e)
+            return BookLookup(False, None, None)
+
+        if value is None:
+            return BookLookup(False, None, int(version))
+        if value == MISSING:
+            return BookLookup(True, None, int(version))
+        return BookLookup(True, BookSchema.model_validate_json(value), int(version))
+
+    async def get_many(
+        self, book_ids: Sequence[int]
+    ) -> Tuple[Dict[int, Optional[BookSchema]], Dict[int, int]]:
+        """
+            The cached entries among book_ids (a cached missing id maps to None) and the versions
+            of the others, for set_many, in one MGET.
+        """
+        try:
+            values = await self.redis.mget(
+                [book_key(book_id) for book_id in book_ids] + [version_key(book_id) for book_id in book_ids]
+            )
+        except RedisError as e:
+            logger.warning("Book cache lookup failed: %s", e)
+            return {}, {}
+
+        entries, versions = {}, {}
+        for book_id, value, version in zip(book_ids, values, values[len(book_ids):]):
+            if value is None:
+                versions[book_id] = int(version or 0)
+            else:
+                entries[book_id] = None if value == MISSING else BookSchema.model_validate_json(value)
+        return entries, versions
+
+    async def versions(self, book_ids: Sequence[int]) -> Dict[int, int]:
+        """Read before loading books that aren't looked up first, like the warm-up."""
+        if not book_ids:
+            return {}
+        try:
+            values = await self.redis.mget([version_key(book_id) for book_id in book_ids])
+        except RedisError as e:
+            logger.warning("Book cache lookup failed: %s", e)
+            return {}
+        return {book_id: int(version or 0) for book_id, version in zip(book_ids, values)}
+
+    async def set(self, book: BookSchema, version: Optional[int]) -> None:
+        await self.set_many([book], {book.id: version})
+
+    async def set_many(self, books: Iterable[BookSchema], versions: Dict[int, Optional[int]]) -> None:
+        """Books without a known version are not stored."""
+        await self._store(
+            (book.id, book.model_dump_json(), self.ttl, versions.get(book.id)) for book in books
+        )
+
+    async def set_missing(self, book_id: int, version: Optional[int]) -> None:
+        await self._store([(book_id, MISSING, self.missing_ttl, version)])
+
+    async def _store(self, entries: Iterable[Tuple[int, bytes | str, int, Optional[int]]]) -> None:
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for book_id, value, ttl, version in entries:
+                    if version is not None:
+                        await self._fill(
+                            keys=[book_key(book_id), version_key(book_id)], args=[version, value, ttl], client=pipe
+                        )
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning("Book cache store failed: %s", e)
+
+    async def invalidate(self, *book_ids: int) -> None:
+        """Drops the entries and bumps their versions, so fills that started before this are skipped."""
+        if not book_ids:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for book_id in book_ids:
+                    pipe.incr(version_key(book_id))
+                    # outlives any fill in flight, an expired version simply starts over at 0
+                    pipe.expire(version_key(book_id), self.ttl)
+                pipe.delete(*(book_key(book_id) for book_id in book_ids))
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning("Book cache invalidation failed: %s", e)
+
+    async def popular_ids(self, count: int) -> List[int]:
+        """The most requested ids, best first."""
+        try:
+            return [int(book_id) for book_id in await self.redis.zrevrange(POPULAR_KEY, 0, count - 1)]
+        except RedisError as e:
+            logger.warning("Book cache popularity lookup failed: %s", e)
+            return []
+
+    async def trim_popular(self, keep: int) -> None:
+        """Drops everything but the top `keep` ids so the popularity set stays bounded."""
+        try:
+            await self.redis.zremrangebyrank(POPULAR_KEY, 0, -(keep + 1))
+        except RedisError as e:
+            logger.warning("Book cache popularity trim failed: %s", e)
+
+    async def stats(self) -> Dict[str, int]:
+        try:
+            counters = await self.redis.hgetall(STATS_KEY)
+        except RedisError as e:
+            logger.warning("Book cache stats lookup failed: %s", e)
+            counters = {}
+        hits, misses = int(counters.get(b"hits", 0)), int(counters.get(b"misses", 0))
+        return {"hits": hits, "misses": misses}
+
+    async def log_stats(self, interval: float) -> None:
+        """Logs the hit/miss counters (shared by all workers) every interval seconds, until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            stats = await self.stats()
+            lookups = stats["hits"] + stats["misses"]
+            logger.info(
+                "Book cache: %s hits, %s misses, hit ratio %.1f%%",
+                stats["hits"], stats["misses"], 100 * stats["hits"] / lookups if lookups else 0,
+            )
+
+    async def clear(self) -> None:
+        """Removes every cache key (entries, counters and popularity)."""
+        await delete_by_pattern(self.redis, f"{KEY_PREFIX}:*")
+
+
+book_cache = BookCache(
+    redis=redis_client,
+    ttl=settings.book_cache_ttl_seconds,
+    missing_ttl=settings.book_cache_missing_ttl_seconds,
+)
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import logging
+import zlib
+from typing import NamedTuple, Optional, Sequence
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from cache.redis_client import delete_by_pattern, redis_client
+from config import settings
+from schemas.validation_schemas import BookFilterParams, BookSortParams
+
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "list_cache"
+GENERATION_KEY = f"{KEY_PREFIX}:generation"
+
+IDENTITY = b"identity"
+ZLIB = b"zlib"
+
+# reads the current generation and the page stored under it in one round trip
+LOOKUP_SCRIPT = """
+local generation = redis.call('GET', KEYS[1]) or '0'
+local key = ARGV[1] .. ':' .. generation .. ':' .. ARGV[2]
+return {generation, redis.call('HMGET', key, 'body', 'cursor', 'encoding', 'etag')}
+"""
+
+
+class CachedPage(NamedTuple):
+    body: bytes
+    next_cursor: Optional[str]
+    etag: Optional[str] = None
+
+
+class ListLookup(NamedTuple):
+    # None if Redis is unavailable
+    generation: Optional[int]
+    page: Optional[CachedPage]
+
+
+def params_hash(
+    filters: BookFilterParams, sorting: BookSortParams, skip: int, limit: int, cursor: Optional[str],
+    fields: Optional[Sequence[str]] = None,
+) -> str:
+    """Hash of the list query, requests that build the same SQL share it."""
+    normalized_filters = filters.model_dump(mode="json", exclude_none=True)
+    # title and author_name are matched with ILIKE and q lowercases its terms anyway
+    for field in ("title", "author_name"):
+        if field in normalized_filters:
+            normalized_filters[field] = normalized_filters[field].lower()
+    if "q" in normalized_filters:
+        normalized_filters["q"] = " ".join(normalized_filters["q"].lower().split())
+
+    payload = {
+        "filters": normalized_filters,
+        "order_by": sorting.order_by or "id",
+        "order_desc": sorting.order_desc,
+        "skip": 0 if cursor else skip or 0,
+        "limit": limit,
+        "cursor": cursor,
+        "fields": list(fields) if fields else None,
+    }
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha256(raw).hexdigest()
+
+
+class ListCache:
+    """
+        Book list pages stored as ready-to-send JSON bytes.
+        Every catalog write bumps the generation counter, which is part of the key,
+        so old pages become unreachable at once and simply expire.
+    """
+
+    def __init__(self, redis: Redis, ttl: int, compress_min_size: Optional[int]):
+        self.redis = redis
+        self.ttl = ttl
+        self.compress_min_size = compress_min_size
+        self._lookup = redis.register_script(LOOKUP_SCRIPT)
+
+    def _key(self, generation: int, key_hash: str) -> str:
+        return f"{KEY_PREFIX}:{generation}:{key_hash}"
+
+    async def get(self, key_hash: str) -> ListLookup:
+        """Returns the current generation and the cached page, if any."""
+        try:
+            generation, (body, cursor, encoding, etag) = await self._lookup(
+                keys=[GENERATION_KEY], args=[KEY_PREFIX, key_hash]
+            )
+        except RedisError as e:
+            logger.warning("List cache lookup failed: %s", e)
+            return ListLookup(generation=None, page=None)
+
+        generation = int(generation)
+        if body is None:
+            return ListLookup(generation=generation, page=None)
+        if encoding == ZLIB:
+            body = zlib.decompress(body)
+        page = CachedPage(
+            body=body,
+            next_cursor=cursor.decode() if cursor else None,
+            etag=etag.decode() if etag else None,
+        )
+        return ListLookup(generation=generation, page=page)
+
+    async def set(self, generation: int, key_hash: str, page: CachedPage) -> None:
+        """Stores the page under the generation it was read with, a concurrent write makes it unreachable."""
+        body, encoding = page.body, IDENTITY
+        if self.compress_min_size is not None and len(body) >= self.compress_min_size:
+            body, encoding = zlib.compress(body, 1), ZLIB
+
+        key = self._key(generation, key_hash)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hset(key, mapping={
+                    "body": body,
+                    "cursor": page.next_cursor or "",
+                    "encoding": encoding,
+                    "etag": page.etag or "",
+                })
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning("List cache store failed: %s", e)
+
+    async def bump_generation(self) -> None:
+        """Called after every committed catalog write."""
+        try:
+            await self.redis.incr(GENERATION_KEY)
+        except RedisError as e:
+            logger.warning("List cache generation bump failed: %s", e)
+
+    async def clear(self) -> None:
+        await delete_by_pattern(self.redis, f"{KEY_PREFIX}:*")
+
+
+list_cache = ListCache(
+    redis=redis_client,
+    ttl=settings.list_cache_ttl_seconds,
+    compress_min_size=settings.list_cache_compress_min_size,
+)
@@ -0,0 +1,23 @@
+from redis.asyncio import Redis
+
+from config import settings
+
+
+# short timeouts: the cache is an optimization, a slow Redis must not stall requests
+redis_client: Redis = Redis.from_url(
+    settings.REDIS_URL,
+    socket_timeout=settings.cache_socket_timeout,
+    socket_connect_timeout=settings.cache_socket_timeout,
+)
+
+
+async def delete_by_pattern(redis: Redis, pattern: str, batch_size: int = 500) -> None:
+    """Deletes matching keys in batches with SCAN, without blocking Redis like KEYS would."""
+    batch = []
+    async for key in redis.scan_iter(match=pattern, count=batch_size):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            await redis.delete(*batch)
+            batch = []
+    if batch:
+        await redis.delete(*batch)
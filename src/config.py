@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import List, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -25,18 +26,66 @@ class Settings(BaseSettings):
     aws_access_key_id: str
     aws_secret_access_key: str
 
+    # S3 client: the thread pool bounds concurrent blocking boto3 calls,
+    # keep it in line with the connection pool size
+    s3_max_workers: int = 20
+    s3_max_pool_connections: int = 20
+    s3_max_attempts: int = 3
+    s3_retry_mode: str = "standard"
+    s3_connect_timeout: float = 5
+    s3_read_timeout: float = 60
+    presigned_url_expire_seconds: int = 900
+
+    # deferred deletion of book files: the worker drains the queue when notified or every poll,
+    # and compares the bucket with books.file_path every reconcile interval (0 disables it);
+    # objects younger than the grace period may belong to an unfinished upload and are kept
+    file_cleanup_enabled: bool = True
+    file_deletion_poll_seconds: float = 30
+    file_deletion_retry_seconds: int = 60
+    file_reconcile_interval_seconds: int = 24 * 60 * 60
+    file_reconcile_grace_seconds: int = 24 * 60 * 60
+
     REDIS_URL: str = "redis://redis:6379/0"
 
+    # single book cache; missing ids are cached for a shorter time,
+    # warm-up preloads that many of the most requested books on startup (0 disables it),
+    # the hit/miss counters are logged every stats interval (0 disables it)
+    cache_socket_timeout: float = 0.5
+    book_cache_ttl_seconds: int = 300
+    book_cache_missing_ttl_seconds: int = 30
+    book_cache_warmup_size: int = 0
+    book_cache_stats_log_seconds: float = 300
+
+    # list pages, compressed with zlib from that many bytes of JSON (None disables compression)
+    list_cache_ttl_seconds: int = 60
+    list_cache_compress_min_size: Optional[int] = 1024
+    # X-Total-Count of filtered lists: the planner estimate from that many rows on, an exact count below
+    exact_count_threshold: int = 10000
+
     DB_URL: str
 
     MODE: str
     private_key: str = read_key_file("jwt-private.pem")
     public_key: str = read_key_file("jwt-public.pem")
+    # public keys of rotated-out signing keys (PEM), still accepted until their tokens expire
+    previous_public_keys: List[str] = []
     algorithm: str = "RS256"
 
     access_token_expire_minutes: int = 15
+    # resolve the user of access tokens from their claims instead of the database;
+    # the full record (refresh, old tokens without the id claim) is cached for a short time
+    auth_user_from_claims: bool = True
+    user_cache_ttl_seconds: float = 30
+    user_cache_size: int = 1024
+    # verified token payloads, each entry expires with its token (0 disables the cache)
+    token_cache_size: int = 10000
     refresh_token_expire_days: int = 30
 
+    # bcrypt cost factor, stored hashes with another cost are rehashed on login;
+    # hashing runs in its own thread pool of that many workers
+    bcrypt_rounds: int = 12
+    bcrypt_max_workers: int = 4
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 
@@ -1,10 +1,15 @@
 TOKEN_TYPE_FIELD = "type"
 ACCESS_TOKEN_TYPE = "access"
 REFRESH_TOKEN_TYPE = "refresh"
+# access token claim with the author id, lets requests skip the user lookup
+USER_ID_FIELD = "uid"
 
 BOOKS = "books"
 BOOK_FOLDER = BOOKS
 
+# text search configuration of the books.search_vector column
+FULL_TEXT_SEARCH_CONFIG = "english"
+
 SUPPORTED_FILE_TYPES = {
     BOOKS: {
         'application/pdf': 'pdf',
@@ -31,4 +36,50 @@ MAX_FILE_SIZES = {
     "txt": DEFAULT_MAX_SIZE,
     "docx": DEFAULT_MAX_SIZE,
     "csv": DEFAULT_MAX_SIZE
-}
\ No newline at end of file
+}
+# upper bound of a book upload request, leaves room for the other form fields
+MAX_UPLOAD_REQUEST_SIZE = max(MAX_FILE_SIZES.values()) + 1 * MB
+
+# size of the chunks a download is streamed in
+DOWNLOAD_CHUNK_SIZE = 256 * KB
+# size of one multipart upload part (S3 requires at least 5 MB for all but the last part)
+UPLOAD_PART_SIZE = 8 * MB
+
+
+# bulk import of book metadata
+IMPORT_BATCH_SIZE = 1000
+MAX_IMPORT_BATCH_SIZE = 10000
+MAX_IMPORT_ERRORS = 1000
+IMPORT_CHUNK_SIZE = 64 * KB
+MAX_IMPORT_ROW_SIZE = 1 * MB
+
+# streaming export of the catalog
+EXPORT_BATCH_SIZE = 1000
+
+# batch fetch/delete by ids
+MAX_BATCH_BOOK_IDS = 100
+# S3 DeleteObjects accepts at most 1000 keys per call
+S3_DELETE_BATCH_SIZE = 1000
+
+# catalog facets, each kept in book_facet_counts under this name
+GENRE_FACET = "genre"
+PUBLISHED_YEAR_FACET = "published_year"
+AUTHOR_FACET = "author"
+# only the authors with the most books are listed
+MAX_AUTHOR_FACETS = 100
+
+# deferred deletion of book files
+FILE_DELETION_BATCH_SIZE = S3_DELETE_BATCH_SIZE
+# pg advisory lock key, keeps bucket reconciliation to one worker at a time
+FILE_RECONCILE_LOCK_ID = 718201
+# every queued object (unreferenced, orphaned or left by a failed write) is deleted after this
+# delay, so an upload of the same content that skipped S3 because the object was still there
+# has time to commit its book
+FILE_DELETION_DELAY_MINUTES = 10
+
+# storage-side compression of text books, applied on upload (file type -> Content-Encoding)
+FILE_CONTENT_ENCODINGS = {
+    "txt": "gzip",
+    "csv": "gzip",
+}
+FILE_COMPRESSION_LEVEL = 6
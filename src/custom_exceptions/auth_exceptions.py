@@ -17,6 +17,11 @@ class UserGetException(AuthException):
         super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
 
 
+class UserUpdateException(AuthException):
+    def __init__(self, detail="Error updating user"):
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
 class UserUnexpectedError(AuthException):
     def __init__(self, detail="User create unexpected error"):
         super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
@@ -1,5 +1,5 @@
 from fastapi import HTTPException, status
 
 class AppException(HTTPException):
-    def __init__(self, status_code: status, detail: str):
-        super().__init__(status_code=status_code, detail=detail)
\ No newline at end of file
+    def __init__(self, status_code: status, detail: str, headers: dict[str, str] | None = None):
+        super().__init__(status_code=status_code, detail=detail, headers=headers)
\ No newline at end of file
@@ -27,4 +27,8 @@ class BookNotFoundException(BookException):
 
 class BookDownloadException(BookException):
     def __init__(self, detail):
-        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
\ No newline at end of file
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+class InvalidCursorException(BookException):
+    def __init__(self, detail="Invalid pagination cursor"):
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
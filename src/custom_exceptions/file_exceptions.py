@@ -33,4 +33,10 @@ class UnsupportedFileTypeException(FileException):
 
 class UnsupportedFileSizeException(FileException):
     def __init__(self, detail):
-        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
\ No newline at end of file
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+class RangeNotSatisfiableException(FileException):
+    def __init__(self, detail="Requested range not satisfiable", object_size: int | None = None):
+        headers = {"Content-Range": f"bytes */{object_size}"} if object_size is not None else None
+        super().__init__(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, detail=detail, headers=headers)
\ No newline at end of file
@@ -1,7 +1,24 @@
 from datetime import datetime
-from sqlalchemy import TIMESTAMP, Enum, ForeignKey, Integer, LargeBinary, String, func
+from sqlalchemy import (
+    DDL,
+    TIMESTAMP,
+    BigInteger,
+    Computed,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    UniqueConstraint,
+    event,
+    func,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, DeclarativeBase, mapped_column, relationship
 from typing import List
+from constants import FILE_DELETION_DELAY_MINUTES, FULL_TEXT_SEARCH_CONFIG
+from database import triggers
 from utils.enums import GenreEnum
 
 
@@ -10,11 +27,18 @@ class Base(DeclarativeBase):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
 
 
+# trigram indexes below need the extension before the tables are created
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+
 class Author(Base):
     __tablename__ = "authors"
+    __table_args__ = (
+        Index("ix_authors_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+    )
     
     name: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
-    email: Mapped[str]
+    email: Mapped[str] = mapped_column(unique=True, index=True)
     password_hash: Mapped[bytes] = mapped_column(LargeBinary)
     books: Mapped[List["Book"]] = relationship("Book", back_populates="author")
     
@@ -23,6 +47,23 @@ class Author(Base):
 
 class Book(Base):
     __tablename__ = "books"
+    __table_args__ = (
+        # (sort column, id) pairs serve keyset pagination with an index range seek
+        Index("ix_books_title_id", "title", "id"),
+        Index("ix_books_published_year_id", "published_year", "id"),
+        Index("ix_books_created_at_id", "created_at", "id"),
+        Index("ix_books_updated_at_id", "updated_at", "id"),
+        # equality filters followed by the sort column
+        Index("ix_books_author_id_id", "author_id", "id"),
+        Index("ix_books_genre_id", "genre", "id"),
+        Index("ix_books_genre_published_year_id", "genre", "published_year", "id"),
+        Index("ix_books_genre_created_at_id", "genre", "created_at", "id"),
+        # serves ILIKE '%...%' filters and similarity search on titles
+        Index("ix_books_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        Index("ix_books_search_vector", "search_vector", postgresql_using="gin"),
+        # file reconciliation and upload finalization look books up by their object key
+        Index("ix_books_file_path", "file_path"),
+    )
     
     title: Mapped[str] = mapped_column(String(255), nullable=False)
     file_path: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -30,8 +71,64 @@ class Book(Base):
     published_year: Mapped[int] = mapped_column(Integer, nullable=False)
     genre: Mapped[GenreEnum] = mapped_column(Enum(GenreEnum), nullable=False)
 
+    # maintained by the database, deferred so regular selects don't load it
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR, Computed(f"to_tsvector('{FULL_TEXT_SEARCH_CONFIG}', title)", persisted=True), deferred=True
+    )
+
     created_at: Mapped[datetime] = mapped_column(TIMESTAMP, server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
     
     author_id: Mapped[int] = mapped_column(ForeignKey("authors.id"), nullable=False)
     author: Mapped["Author"] = relationship("Author", back_populates="books")
+
+
+class PendingFileDeletion(Base):
+    """S3 objects waiting to be deleted, enqueued in the same transaction that stopped referencing them."""
+    __tablename__ = "pending_file_deletions"
+    __table_args__ = (
+        Index("ix_pending_file_deletions_available_at_id", "available_at", "id"),
+    )
+
+    file_path: Mapped[str] = mapped_column(String(255), nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    # failed deletions are retried with a backoff
+    available_at: Mapped[datetime] = mapped_column(TIMESTAMP, server_default=func.now())
+    created_at: Mapped[datetime] = mapped_column(TIMESTAMP, server_default=func.now())
+
+
+class StoredFile(Base):
+    """Book objects in S3 and how many books reference each, content-addressed keys are shared."""
+    __tablename__ = "stored_files"
+
+    file_path: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
+    ref_count: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    created_at: Mapped[datetime] = mapped_column(TIMESTAMP, server_default=func.now())
+
+
+# ref counts of the S3 objects (same as migration 6e0b1f8c4a27)
+BOOK_FILE_REFS_FUNCTION = DDL(triggers.book_file_refs_function(FILE_DELETION_DELAY_MINUTES))
+BOOK_FILE_REFS_TRIGGER = DDL(triggers.BOOK_FILE_REFS_TRIGGER)
+event.listen(Base.metadata, "after_create", BOOK_FILE_REFS_FUNCTION)
+event.listen(Base.metadata, "after_create", BOOK_FILE_REFS_TRIGGER)
+
+
+class BookFacetCount(Base):
+    """Books per genre, published year and author, kept current by the books_facet_counts triggers."""
+    __tablename__ = "book_facet_counts"
+    __table_args__ = (
+        UniqueConstraint("facet", "value"),
+    )
+
+    facet: Mapped[str] = mapped_column(String(32), nullable=False)
+    value: Mapped[str] = mapped_column(String(255), nullable=False)
+    # values without books stay at 0
+    count: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0")
+
+
+# facet counters (same as migration 4524075c06ce)
+BOOK_FACET_COUNTS_FUNCTION = DDL(triggers.BOOK_FACET_COUNTS_FUNCTION)
+BOOK_FACET_COUNTS_TRIGGERS = [DDL(trigger) for trigger in triggers.BOOK_FACET_COUNTS_TRIGGERS.values()]
+event.listen(Base.metadata, "after_create", BOOK_FACET_COUNTS_FUNCTION)
+for trigger in BOOK_FACET_COUNTS_TRIGGERS:
+    event.listen(Base.metadata, "after_create", trigger)
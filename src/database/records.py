@@ -0,0 +1,28 @@
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from utils.enums import GenreEnum
+
+
+class AuthorRecord(NamedTuple):
+    id: int
+    name: str
+    created_at: datetime
+
+
+class BookRecord(NamedTuple):
+    """
+        Read-only book row of the Core read path: a plain tuple, no identity map,
+        no instance state or change tracking. The attributes match BookSchema
+        (plus author_id, a sortable column), so serializers and cursors take it as a Book.
+        Columns left out of a sparse select stay None.
+    """
+    title: Optional[str] = None
+    file_path: Optional[str] = None
+    published_year: Optional[int] = None
+    genre: Optional[GenreEnum] = None
+    id: Optional[int] = None
+    author: Optional[AuthorRecord] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    author_id: Optional[int] = None
@@ -0,0 +1,84 @@
+# SQL of the books triggers, used by models.py for create_all and by the migrations that install them
+
+
+def book_file_refs_function(deletion_delay_minutes: int) -> str:
+    """
+        Every change of books.file_path adjusts stored_files.ref_count in the same transaction,
+        an object whose last reference is gone is queued for deletion after the delay.
+    """
+    return f"""
+CREATE OR REPLACE FUNCTION books_file_refs() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.file_path IS NOT DISTINCT FROM OLD.file_path THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.file_path <> '' THEN
+        INSERT INTO stored_files (file_path, ref_count) VALUES (NEW.file_path, 1)
+        ON CONFLICT (file_path) DO UPDATE SET ref_count = stored_files.ref_count + 1;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.file_path <> '' THEN
+        UPDATE stored_files SET ref_count = ref_count - 1 WHERE file_path = OLD.file_path;
+        DELETE FROM stored_files WHERE file_path = OLD.file_path AND ref_count <= 0;
+        IF FOUND THEN
+            INSERT INTO pending_file_deletions (file_path, available_at)
+            VALUES (OLD.file_path, now() + interval '{int(deletion_delay_minutes)} minutes');
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+BOOK_FILE_REFS_TRIGGER = """
+CREATE TRIGGER books_file_refs
+AFTER INSERT OR DELETE OR UPDATE OF file_path ON books
+FOR EACH ROW EXECUTE FUNCTION books_file_refs()
+"""
+
+
+# statement level triggers with transition tables: one grouped upsert per statement, however many rows
+# it touched; updates that keep genre, year and author net out to nothing
+_NEW_BOOKS = "SELECT genre, published_year, author_id, 1 AS delta FROM new_books"
+_OLD_BOOKS = "SELECT genre, published_year, author_id, -1 AS delta FROM old_books"
+_FACET_COUNTS_UPSERT = """
+        INSERT INTO book_facet_counts (facet, value, count)
+        SELECT f.facet, f.value, sum(b.delta)
+        FROM ({changes}) AS b,
+        LATERAL (VALUES
+            ('genre', b.genre::text),
+            ('published_year', b.published_year::text),
+            ('author', b.author_id::text)
+        ) AS f (facet, value)
+        GROUP BY f.facet, f.value
+        HAVING sum(b.delta) <> 0
+        -- a fixed lock order, concurrent writes can't deadlock on the counters
+        ORDER BY f.facet, f.value
+        ON CONFLICT (facet, value) DO UPDATE SET count = book_facet_counts.count + EXCLUDED.count;"""
+
+BOOK_FACET_COUNTS_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION books_facet_counts() RETURNS trigger AS $$
+BEGIN
+    -- a transition table exists only for the events it was declared for
+    IF TG_OP = 'INSERT' THEN{_FACET_COUNTS_UPSERT.format(changes=_NEW_BOOKS)}
+    ELSIF TG_OP = 'DELETE' THEN{_FACET_COUNTS_UPSERT.format(changes=_OLD_BOOKS)}
+    ELSE{_FACET_COUNTS_UPSERT.format(changes=f"{_NEW_BOOKS} UNION ALL {_OLD_BOOKS}")}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# trigger name -> CREATE TRIGGER statement
+BOOK_FACET_COUNTS_TRIGGERS = {
+    name: f"""
+CREATE TRIGGER {name}
+AFTER {event} ON books REFERENCING {tables}
+FOR EACH STATEMENT EXECUTE FUNCTION books_facet_counts()
+"""
+    for name, event, tables in (
+        ("books_facet_counts_insert", "INSERT", "NEW TABLE AS new_books"),
+        ("books_facet_counts_update", "UPDATE", "OLD TABLE AS old_books NEW TABLE AS new_books"),
+        ("books_facet_counts_delete", "DELETE", "OLD TABLE AS old_books"),
+    )
+}
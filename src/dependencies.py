@@ -1,17 +1,18 @@
-from typing import Annotated
+from typing import Annotated, List, Optional, Tuple
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from aws.s3_actions import S3Service
 from database import session_getter
 from repositories.book_repository import BookRepository
 from repositories.user_repository import UserRepository
-from schemas.auth_schemas import UserOut
+from schemas.auth_schemas import TokenUser
 from schemas.validation_schemas import BookFilterParams, BookSortParams
-from auth.validation import get_current_auth_user
+from auth.validation import get_current_token_user
 from services.book_service import BookService
 from services.user_service import UserService
-from utils.util_funcs import get_filters, get_sorting
-from utils.validation_funcs import validate_book_id
+from utils.http_funcs import ConditionalHeaders
+from utils.util_funcs import get_conditional_headers, get_filters, get_sorting
+from utils.validation_funcs import validate_book_fields, validate_book_id, validate_book_ids
 from config import settings
 
 
@@ -20,7 +21,10 @@ BookRepositoryDep = Annotated[BookRepository, Depends(BookRepository)]
 UserRepositoryDep = Annotated[UserRepository, Depends(UserRepository)]
 FiltersDep = Annotated[BookFilterParams, Depends(get_filters)]
 SortingDep = Annotated[BookSortParams, Depends(get_sorting)]
-UserDep = Annotated[UserOut, Depends(get_current_auth_user)]
+ConditionalDep = Annotated[ConditionalHeaders, Depends(get_conditional_headers)]
+UserDep = Annotated[TokenUser, Depends(get_current_token_user)]
 ValidateBookIdDep = Annotated[int, Depends(validate_book_id)]
+ValidateBookIdsDep = Annotated[List[int], Depends(validate_book_ids)]
+BookFieldsDep = Annotated[Optional[Tuple[str, ...]], Depends(validate_book_fields)]
 BookServiceDep = Annotated[BookService, Depends(BookService)]
 UserServiceDep = Annotated[UserService, Depends(UserService)]
\ No newline at end of file
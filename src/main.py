@@ -1,13 +1,50 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from routers import router
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
+from cache import book_cache
 from config import settings
+from constants import MAX_UPLOAD_REQUEST_SIZE
+from database import session_factory
+from services.book_service import BookService
+from services.file_cleanup_service import file_cleanup_service
+from utils.middlewares import UploadSizeLimitMiddleware
+
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.book_cache_warmup_size > 0:
+        try:
+            async with session_factory() as session:
+                warmed = await BookService().warm_up_cache(session, settings.book_cache_warmup_size)
+            logger.info("Book cache warmed up with %s books", warmed)
+        except Exception as e:
+            # a cold cache is slower, not broken
+            logger.warning("Book cache warm-up failed: %s", e)
+
+    file_cleanup = asyncio.create_task(file_cleanup_service.run()) if settings.file_cleanup_enabled else None
+    cache_stats = (
+        asyncio.create_task(book_cache.log_stats(settings.book_cache_stats_log_seconds))
+        if settings.book_cache_stats_log_seconds > 0 else None
+    )
+    yield
+    for task in (file_cleanup, cache_stats):
+        if task:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
 
 
 app = FastAPI(
     title="Book Management System API",
+    lifespan=lifespan,
 )
 
 limiter = Limiter(key_func=get_remote_address, storage_uri=settings.REDIS_URL)
@@ -15,4 +52,11 @@ app.state.limiter = limiter
 
 app.include_router(router)
 
+# book create (POST /book/) and update (PATCH /book/{id}/) carry the book file
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_body_size=MAX_UPLOAD_REQUEST_SIZE,
+    path_pattern=r"^/api/v1/book/(\d+/)?$",
+)
+
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
\ No newline at end of file
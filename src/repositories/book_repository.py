@@ -1,7 +1,12 @@
-from typing import List
-from sqlalchemy import select
+import json
+from typing import Any, AsyncIterator, List, Optional, Sequence, Tuple
+from sqlalchemy import Row, Select, String, and_, cast, delete, func, insert, literal, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import REGCONFIG
 from sqlalchemy.ext.asyncio import AsyncSession
-from database.models import Author, Book
+from constants import AUTHOR_FACET, FULL_TEXT_SEARCH_CONFIG, GENRE_FACET
+from database.explain import Explain
+from database.models import Author, Book, BookFacetCount
+from database.records import AuthorRecord, BookRecord
 from schemas.book_schemas import BookCreateSchema, BookNewSchema, BookSchema, BookUpdateSchema
 from sqlalchemy.orm import joinedload
 from custom_exceptions.book_exceptions import (
@@ -15,6 +20,65 @@ from schemas.validation_schemas import BookFilterParams, BookSortParams
 
 
 class BookRepository:
+    @staticmethod
+    def _tsquery(q: str):
+        return func.websearch_to_tsquery(cast(FULL_TEXT_SEARCH_CONFIG, REGCONFIG), q)
+
+    @staticmethod
+    def _apply_filters(
+        query: Select, filters: BookFilterParams, author_joined: bool = False
+    ) -> Select:
+        if filters.title:
+            query = query.filter(Book.title.ilike(f"%{filters.title}%"))
+        if filters.published_year is not None:
+            query = query.filter(Book.published_year == filters.published_year)
+        if filters.genre:
+            query = query.filter(Book.genre == filters.genre)
+        if filters.author_name:
+            if not author_joined:
+                query = query.join(Author)
+            query = query.filter(Author.name.ilike(f"%{filters.author_name}%"))
+        if filters.q:
+            # served by the GIN index on the generated books.search_vector column
+            query = query.filter(Book.search_vector.op("@@")(BookRepository._tsquery(filters.q)))
+        return query
+
+    @staticmethod
+    def _apply_page(
+        query: Select,
+        filters: BookFilterParams,
+        sorting: BookSortParams,
+        skip: int,
+        limit: int,
+        cursor: Optional[Tuple[Any, int]],
+    ) -> Select:
+        """Ordering plus offset or keyset pagination, shared by the ORM and the Core read path."""
+        order_column = getattr(Book, sorting.order_by or "id", None) or Book.id
+        # the id tiebreaker keeps the order stable for keyset pagination
+        order_columns = [order_column] if order_column is Book.id else [order_column, Book.id]
+        if filters.q:
+            # the most relevant matches go first, the requested sorting breaks ties
+            query = query.order_by(
+                func.ts_rank(Book.search_vector, BookRepository._tsquery(filters.q)).desc()
+            )
+        query = query.order_by(
+            *(column.desc() if sorting.order_desc else column.asc() for column in order_columns)
+        )
+
+        if cursor is not None:
+            # keyset pagination: seek past the last row of the previous page
+            value, last_id = cursor
+            if order_column is Book.id:
+                key, last_key = Book.id, last_id
+            else:
+                key = tuple_(order_column, Book.id)
+                last_key = tuple_(literal(value, order_column.type), last_id)
+            query = query.filter(key < last_key if sorting.order_desc else key > last_key)
+        else:
+            query = query.offset(skip)
+
+        return query.limit(limit)
+
     @staticmethod
     async def get_books(
         session: AsyncSession,
@@ -22,29 +86,216 @@ class BookRepository:
         sorting: BookSortParams,
         skip: int = 0,
         limit: int = 10,
+        cursor: Optional[Tuple[Any, int]] = None,
     ) -> List[BookSchema]:
         try:
             query = select(Book).options(joinedload(Book.author))
+            query = BookRepository._apply_filters(query, filters)
+            query = BookRepository._apply_page(query, filters, sorting, skip, limit, cursor)
             
-            if filters.title:
-                query = query.filter(Book.title.ilike(f"%{filters.title}%"))
-            if filters.published_year is not None:
-                query = query.filter(Book.published_year == filters.published_year)
-            if filters.author_name:
-                query = query.join(Author).filter(Author.name.ilike(f"%{filters.author_name}%"))
-            
-            if sorting.order_by:
-                order_column = getattr(Book, sorting.order_by, None)
-                if order_column:
-                    query = query.order_by(order_column.desc() if sorting.order_desc else order_column.asc())
-            
-            query = query.offset(skip).limit(limit)
-            
+            result = await session.execute(query)
+            return [book for book in result.scalars().all()]
+        except Exception as e:
+            raise BookGetException(str(e))
+
+    @staticmethod
+    async def get_book_records(
+        session: AsyncSession,
+        filters: BookFilterParams,
+        sorting: BookSortParams,
+        skip: int = 0,
+        limit: int = 10,
+        cursor: Optional[Tuple[Any, int]] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[BookRecord]:
+        """
+            get_books for read-only use: a Core select of just the response columns, mapped
+            into tuple records instead of tracked Book and Author instances. Writes keep using the ORM.
+            `fields` narrows the select to those record fields (plus the sort column and id the
+            cursor needs); authors are joined only for "author" or an author_name filter.
+        """
+        wanted = set(fields or BookRecord._fields)
+        wanted.update(("id", sorting.order_by or "id"))
+        book_fields = [field for field in BookRecord._fields if field != "author" and field in wanted]
+        with_author = "author" in wanted
+
+        try:
+            query = select(*(getattr(Book, field) for field in book_fields))
+            if with_author:
+                query = query.add_columns(Author.id, Author.name, Author.created_at)
+                query = query.join(Author, Book.author_id == Author.id)
+            query = BookRepository._apply_filters(query, filters, author_joined=with_author)
+            query = BookRepository._apply_page(query, filters, sorting, skip, limit, cursor)
+
+            result = await session.execute(query)
+            book_count = len(book_fields)
+            return [
+                BookRecord(
+                    **dict(zip(book_fields, row)),
+                    author=AuthorRecord(*row[book_count:]) if with_author else None,
+                )
+                for row in result.tuples()
+            ]
+        except Exception as e:
+            raise BookGetException(str(e))
+    
+    @staticmethod
+    async def count_books(
+        session: AsyncSession, filters: BookFilterParams, exact_threshold: int
+    ) -> Tuple[int, bool]:
+        """
+            Number of books matching the filters and whether it is exact. The whole catalog is summed
+            from book_facet_counts; a filtered count uses the planner estimate (reltuples times the
+            selectivity of the filters) from exact_threshold rows on and count(*) below it.
+        """
+        try:
+            if not filters.model_dump(exclude_none=True):
+                query = select(func.coalesce(func.sum(BookFacetCount.count), 0)).filter(
+                    BookFacetCount.facet == GENRE_FACET
+                )
+                return int(await session.scalar(query)), True
+
+            query = BookRepository._apply_filters(select(Book.id), filters)
+            plan = await session.scalar(Explain(query))
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = int(plan[0]["Plan"]["Plan Rows"])
+            if estimate >= exact_threshold:
+                return estimate, False
+
+            count_query = BookRepository._apply_filters(select(func.count()).select_from(Book), filters)
+            return int(await session.scalar(count_query)), True
+        except Exception as e:
+            raise BookGetException(str(e))
+
+    @staticmethod
+    async def get_facet_counts(
+        session: AsyncSession, max_authors: int
+    ) -> List[Row]:
+        """
+            (facet, value, count, author_name) of the whole catalog, read from book_facet_counts
+            instead of grouping the books table; only the max_authors authors with most books.
+        """
+        try:
+            ranked = (
+                select(
+                    BookFacetCount.facet,
+                    BookFacetCount.value,
+                    BookFacetCount.count,
+                    func.row_number().over(
+                        partition_by=BookFacetCount.facet, order_by=BookFacetCount.count.desc()
+                    ).label("rank"),
+                )
+                .filter(BookFacetCount.count > 0)
+                .subquery()
+            )
+            query = (
+                select(ranked.c.facet, ranked.c.value, ranked.c.count, Author.name.label("author_name"))
+                .outerjoin(
+                    Author,
+                    and_(ranked.c.facet == AUTHOR_FACET, cast(Author.id, String) == ranked.c.value),
+                )
+                .filter(or_(ranked.c.facet != AUTHOR_FACET, ranked.c.rank <= max_authors))
+            )
+            return (await session.execute(query)).all()
+        except Exception as e:
+            raise BookGetException(str(e))
+
+    @staticmethod
+    async def get_filtered_facet_counts(
+        session: AsyncSession, filters: BookFilterParams
+    ) -> List[Row]:
+        """
+            Counts per genre, year and author of the filtered books in one scan (GROUPING SETS).
+            `grouping` tells the sets apart: 3 genre, 5 published_year, 6 author.
+        """
+        try:
+            query = select(
+                Book.genre,
+                Book.published_year,
+                Book.author_id,
+                Author.name.label("author_name"),
+                func.count().label("count"),
+                func.grouping(Book.genre, Book.published_year, Book.author_id).label("grouping"),
+            ).join(Author, Book.author_id == Author.id)
+            query = BookRepository._apply_filters(query, filters, author_joined=True)
+            query = query.group_by(
+                func.grouping_sets(
+                    tuple_(Book.genre),
+                    tuple_(Book.published_year),
+                    tuple_(Book.author_id, Author.name),
+                )
+            )
+            return (await session.execute(query)).all()
+        except Exception as e:
+            raise BookGetException(str(e))
+
+    @staticmethod
+    async def search_books(
+        session: AsyncSession,
+        search: str,
+        filters: BookFilterParams,
+        skip: int = 0,
+        limit: int = 10,
+    ) -> List[BookSchema]:
+        """Substring and typo-tolerant title search ranked by trigram similarity."""
+        try:
+            query = (
+                select(Book)
+                .options(joinedload(Book.author))
+                .filter(
+                    # both operators are served by the gin_trgm_ops index on books.title
+                    or_(
+                        Book.title.ilike(f"%{search}%"),
+                        Book.title.op("%>")(search),
+                    )
+                )
+            )
+            query = BookRepository._apply_filters(query, filters)
+            query = (
+                query.order_by(
+                    func.word_similarity(search, Book.title).desc(),
+                    func.similarity(Book.title, search).desc(),
+                    Book.id,
+                )
+                .offset(skip)
+                .limit(limit)
+            )
+
             result = await session.execute(query)
             return [book for book in result.scalars().all()]
         except Exception as e:
             raise BookGetException(str(e))
     
+    @staticmethod
+    async def stream_books(
+        session: AsyncSession,
+        filters: BookFilterParams,
+        batch_size: int,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """Yields plain rows in batches from a server-side cursor, never holding the whole result."""
+        query = (
+            select(
+                Book.id,
+                Book.title,
+                Book.published_year,
+                Book.genre,
+                Book.author_id,
+                Author.name.label("author_name"),
+                Book.file_path,
+                Book.created_at,
+                Book.updated_at,
+            )
+            .join(Author)
+            .order_by(Book.id)
+            .execution_options(yield_per=batch_size)
+        )
+        query = BookRepository._apply_filters(query, filters, author_joined=True)
+
+        result = await session.stream(query)
+        async for rows in result.partitions():
+            yield rows
+    
     @staticmethod
     async def get_book_by_id(
         session: AsyncSession, book_id: int
@@ -56,6 +307,61 @@ class BookRepository:
             if not book:
                 raise BookNotFoundException()
             return book
+        except BookNotFoundException:
+            raise
+        except Exception as e:
+            raise BookGetException(str(e))
+    
+    @staticmethod
+    async def get_books_by_ids(
+        session: AsyncSession, book_ids: Sequence[int]
+    ) -> List[BookSchema]:
+        """Loads the given books with their authors in one query, missing ids are skipped."""
+        if not book_ids:
+            return []
+        try:
+            query = select(Book).options(joinedload(Book.author)).filter(Book.id.in_(book_ids))
+            result = await session.execute(query)
+            return result.scalars().all()
+        except Exception as e:
+            raise BookGetException(str(e))
+    
+    @staticmethod
+    async def delete_author_books(
+        session: AsyncSession, book_ids: Sequence[int], author_id: int
+    ) -> Tuple[List[Row], List[int]]:
+        """
+            Deletes the books if all of the existing ones belong to the author.
+            Returns the deleted (id, file_path) rows and the ids of other authors' books,
+            nothing is deleted when the latter is not empty.
+        """
+        try:
+            # one query checks the ownership of the whole batch and locks it until the delete
+            query = (
+                select(Book.id, Book.author_id, Book.file_path)
+                .filter(Book.id.in_(book_ids))
+                .with_for_update()
+            )
+            books = (await session.execute(query)).all()
+            foreign_ids = [book.id for book in books if book.author_id != author_id]
+            if foreign_ids or not books:
+                await session.rollback()
+                return [], foreign_ids
+
+            await session.execute(delete(Book).filter(Book.id.in_([book.id for book in books])))
+            await session.commit()
+            return books, []
+        except Exception as e:
+            await session.rollback()
+            raise BookDeleteException(f"Error while deleting books: {str(e)}")
+
+    @staticmethod
+    async def file_path_exists(
+        session: AsyncSession, file_path: str
+    ) -> bool:
+        try:
+            query = select(select(Book.id).filter(Book.file_path == file_path).exists())
+            return bool(await session.scalar(query))
         except Exception as e:
             raise BookGetException(str(e))
     
@@ -79,29 +385,74 @@ class BookRepository:
             await session.rollback()
             raise BookCreateException(f"Error while creating book: {str(e)}")
     
+    @staticmethod
+    async def bulk_create_books(
+        session: AsyncSession, books_insert: List[BookCreateSchema], author_id: int
+    ) -> List[int]:
+        """Inserts a batch of books with multi-row INSERT statements, returns the new ids."""
+        if not books_insert:
+            return []
+        try:
+            book_ids = await session.scalars(
+                insert(Book).returning(Book.id),
+                [
+                    {
+                        "title": book_insert.title,
+                        "published_year": book_insert.published_year,
+                        "genre": book_insert.genre.value,
+                        "author_id": author_id,
+                        "file_path": book_insert.file_path,
+                    }
+                    for book_insert in books_insert
+                ],
+            )
+            book_ids = book_ids.all()
+            await session.commit()
+            return book_ids
+        except Exception as e:
+            await session.rollback()
+            raise BookCreateException(f"Error while importing books: {str(e)}")
+    
     @staticmethod
     async def update_book(
         session: AsyncSession, book_update: BookUpdateSchema, book_id: int, author_id: int
-    ) -> BookNewSchema:
+    ) -> Optional[Row]:
+        """
+            Author check and update in one UPDATE ... RETURNING, the row also carries
+            the previous file_path (old_file_path). None when the book is missing or belongs to someone else.
+            The books_file_refs trigger queues a file that lost its last reference for deletion.
+        """
         try:
-            query = select(Book).filter(Book.id == book_id)
-            result = await session.execute(query)
-            book = result.scalar_one_or_none()
-            if not book:
-                raise BookNotFoundException()
-            
-            if book_update.title:
-                book.title = book_update.title
-            if book_update.published_year is not None:
-                book.published_year = book_update.published_year
-            if book_update.genre:
-                book.genre = book_update.genre.value
-            if book_update.file_path:
-                book.file_path = book_update.file_path
-            book.author_id = author_id
-            
+            # FOR UPDATE makes the CTE see the latest committed file_path
+            old = (
+                select(Book.id, Book.file_path)
+                .filter(Book.id == book_id, Book.author_id == author_id)
+                .with_for_update()
+                .cte("old")
+            )
+            values = book_update.model_dump(
+                include={"title", "published_year", "genre", "file_path"}, exclude_none=True
+            )
+            if "genre" in values:
+                values["genre"] = values["genre"].value
+            query = (
+                update(Book)
+                .filter(Book.id == old.c.id)
+                .values(**values)
+                .returning(
+                    Book.id,
+                    Book.title,
+                    Book.file_path,
+                    Book.published_year,
+                    Book.genre,
+                    Book.author_id,
+                    Book.created_at,
+                    Book.updated_at,
+                    old.c.file_path.label("old_file_path"),
+                )
+            )
+            book = (await session.execute(query)).one_or_none()
             await session.commit()
-            await session.refresh(book)
             return book
         except Exception as e:
             await session.rollback()
@@ -110,11 +461,20 @@ class BookRepository:
     @staticmethod
     async def delete_book(
         session: AsyncSession,
-        book_id: int
-    ) -> Book:
+        book_id: int,
+        author_id: int,
+    ) -> Optional[Row]:
+        """
+            DELETE ... RETURNING of the author's book, None when it is missing or belongs to someone else.
+            The books_file_refs trigger queues its file for deletion if no other book references it.
+        """
         try:
-            book = await session.get(Book, book_id)
-            await session.delete(book)
+            query = (
+                delete(Book)
+                .filter(Book.id == book_id, Book.author_id == author_id)
+                .returning(Book.id, Book.file_path)
+            )
+            book = (await session.execute(query)).one_or_none()
             await session.commit()
             return book
         except Exception as e:
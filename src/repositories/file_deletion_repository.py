@@ -0,0 +1,125 @@
+from datetime import timedelta
+from typing import List, Sequence, Set
+from sqlalchemy import Row, delete, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from constants import FILE_DELETION_DELAY_MINUTES
+from database.models import Book, PendingFileDeletion, StoredFile
+from custom_exceptions.file_exceptions import UnexpectedFileError
+
+
+class FileDeletionRepository:
+    @staticmethod
+    async def enqueue(
+        session: AsyncSession, file_paths: Sequence[str]
+    ) -> None:
+        file_paths = [file_path for file_path in file_paths if file_path]
+        if not file_paths:
+            return
+        try:
+            # the same delay the books_file_refs trigger gives,
+            # so an upload dedup of the same content can still commit
+            available_at = func.now() + timedelta(minutes=FILE_DELETION_DELAY_MINUTES)
+            await session.execute(
+                insert(PendingFileDeletion).values(available_at=available_at),
+                [{"file_path": file_path} for file_path in file_paths],
+            )
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            raise UnexpectedFileError(f"Error while enqueuing file deletions: {str(e)}")
+
+    @staticmethod
+    async def claim_batch(
+        session: AsyncSession, batch_size: int
+    ) -> List[Row]:
+        """
+            Locks up to batch_size due deletions until the transaction ends,
+            SKIP LOCKED lets several workers drain the queue side by side.
+        """
+        try:
+            query = (
+                select(PendingFileDeletion.id, PendingFileDeletion.file_path)
+                .filter(PendingFileDeletion.available_at <= func.now())
+                .order_by(PendingFileDeletion.available_at, PendingFileDeletion.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            return (await session.execute(query)).all()
+        except Exception as e:
+            await session.rollback()
+            raise UnexpectedFileError(f"Error while reading file deletions: {str(e)}")
+
+    @staticmethod
+    async def lock_stored_files(
+        session: AsyncSession, file_paths: Sequence[str]
+    ) -> Set[str]:
+        """
+            Locks the stored_files rows of the keys until the transaction ends, creating the missing ones
+            with no references, and returns the keys some book references. Book writes take these locks
+            right before storing the key and the cleanup worker before deleting, so an object can't be
+            deleted while a book that reuses it is being written.
+        """
+        if not file_paths:
+            return set()
+        try:
+            # sorted, concurrent callers take the locks in the same order
+            query = (
+                pg_insert(StoredFile)
+                .values([{"file_path": file_path} for file_path in sorted(set(file_paths))])
+                .on_conflict_do_update(
+                    index_elements=[StoredFile.file_path],
+                    set_={"ref_count": StoredFile.ref_count},
+                )
+                .returning(StoredFile.file_path, StoredFile.ref_count)
+            )
+            return {row.file_path for row in (await session.execute(query)).all() if row.ref_count > 0}
+        except Exception as e:
+            await session.rollback()
+            raise UnexpectedFileError(f"Error while locking stored files: {str(e)}")
+
+    @staticmethod
+    async def finish_batch(
+        session: AsyncSession, done_ids: Sequence[int], failed_ids: Sequence[int],
+        file_paths: Sequence[str], retry_delay: timedelta,
+    ) -> None:
+        """
+            Removes the done deletions and postpones the failed ones, releasing the claimed batch.
+            The stored_files rows of the batch that no book references are dropped with it.
+        """
+        try:
+            if file_paths:
+                await session.execute(
+                    delete(StoredFile).filter(StoredFile.file_path.in_(file_paths), StoredFile.ref_count <= 0)
+                )
+            if done_ids:
+                await session.execute(
+                    delete(PendingFileDeletion).filter(PendingFileDeletion.id.in_(done_ids))
+                )
+            if failed_ids:
+                await session.execute(
+                    update(PendingFileDeletion)
+                    .filter(PendingFileDeletion.id.in_(failed_ids))
+                    .values(
+                        attempts=PendingFileDeletion.attempts + 1,
+                        # linear backoff
+                        available_at=func.now() + retry_delay * (PendingFileDeletion.attempts + 1),
+                    )
+                )
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            raise UnexpectedFileError(f"Error while updating file deletions: {str(e)}")
+
+    @staticmethod
+    async def get_referenced_file_paths(
+        session: AsyncSession, file_paths: Sequence[str]
+    ) -> Set[str]:
+        """The file_paths some book still points at, one indexed IN lookup per call."""
+        if not file_paths:
+            return set()
+        try:
+            query = select(Book.file_path).filter(Book.file_path.in_(file_paths))
+            return set((await session.scalars(query)).all())
+        except Exception as e:
+            raise UnexpectedFileError(f"Error while checking file paths: {str(e)}")
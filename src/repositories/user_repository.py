@@ -1,9 +1,9 @@
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from database.models import Author
 from auth.utils import hash_password
 from schemas.auth_schemas import UserIn, UserOut
-from custom_exceptions.auth_exceptions import UserCreateException, UserGetException
+from custom_exceptions.auth_exceptions import UserCreateException, UserGetException, UserUpdateException
 
 
 class UserRepository:
@@ -16,7 +16,7 @@ class UserRepository:
             new_user: Author = Author(
                 name=user_in.name,
                 email=user_in.email,
-                password_hash=hash_password(user_in.password_hash)
+                password_hash=await hash_password(user_in.password_hash)
             )
             session.add(new_user)
             await session.commit()
@@ -50,4 +50,21 @@ class UserRepository:
             return None
         except Exception as e:
             raise UserGetException(f"Failed to get user by email: {e}")
-    
\ No newline at end of file
+    
+
+    @staticmethod
+    async def update_password_hash(
+        session: AsyncSession,
+        user_id: int,
+        password_hash: bytes,
+    ) -> None:
+        try:
+            await session.execute(
+                update(Author)
+                .where(Author.id==user_id)
+                .values(password_hash=password_hash)
+            )
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            raise UserUpdateException(f"Failed to update password hash: {e}")
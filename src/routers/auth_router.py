@@ -1,6 +1,7 @@
 from typing import Annotated
 from fastapi import APIRouter, Depends, Request, status
 
+from auth.keys import key_set
 from auth.validation import validate_auth_user, get_current_auth_user_for_refresh
 from dependencies import SessionDep, UserServiceDep
 from schemas.auth_schemas import TokenInfo, UserIn, UserOut
@@ -52,4 +53,14 @@ async def auth_refresh_jwt(
     user: Annotated[UserOut, Depends(get_current_auth_user_for_refresh)],
     user_service: UserServiceDep,
 ) -> TokenInfo:
-    return user_service.refresh_jwt(user)
\ No newline at end of file
+    return user_service.refresh_jwt(user)
+
+@router.get(
+    "/jwks/",
+    summary="Public keys that verify the issued tokens (JSON Web Key Set)",
+)
+@limiter.limit("5/minute")  # 5 requests in a minute
+async def jwks_handler(
+    request: Request,
+) -> dict:
+    return key_set.jwks()
\ No newline at end of file
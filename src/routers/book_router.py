@@ -1,24 +1,46 @@
 from typing import List, Optional
-from fastapi import APIRouter, File, Form, Request, Response, UploadFile, status
+from fastapi import APIRouter, File, Form, Header, Query, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
 
 from dependencies import (
+    BookFieldsDep,
     BookServiceDep,
+    ConditionalDep,
     FiltersDep,
     SessionDep, SortingDep, 
-    UserDep, ValidateBookIdDep
+    UserDep, ValidateBookIdDep, ValidateBookIdsDep
 )
-from schemas.book_schemas import BookNewSchema, BookSchema
+from constants import IMPORT_BATCH_SIZE, MAX_IMPORT_BATCH_SIZE
+from schemas.book_schemas import (
+    BookBatchDeleteResultSchema,
+    BookCreateSchema,
+    BookDownloadUrlSchema,
+    BookFacetsSchema,
+    BookImportResultSchema,
+    BookNewSchema,
+    BookSchema,
+    BookUploadUrlRequestSchema,
+    BookUploadUrlSchema,
+)
+from utils.http_funcs import Validators, not_modified_response, version_etag
 from utils.limiter import limiter
-from utils.enums import GenreEnum
+from utils.responses import FastJSONResponse
+from utils.serialization_funcs import book_to_json, books_to_json
+from utils.enums import FileFormat, GenreEnum
 
 
 router = APIRouter(
     prefix="/book", 
     tags=["Book Operations"],
+    default_response_class=FastJSONResponse,
 )
 
 
-@router.get('/', response_model=List[BookSchema])
+@router.get(
+    '/',
+    response_model=List[BookSchema],
+    description="With fields= every book holds only the listed fields, the author join is skipped without author",
+)
 @limiter.limit("5/minute")  # 5 requests in a minute
 async def get_books(
     request: Request,
@@ -26,15 +48,71 @@ async def get_books(
     book_service: BookServiceDep,
     filters: FiltersDep,
     sorting: SortingDep,
+    conditions: ConditionalDep,
+    fields: BookFieldsDep,
     skip: Optional[int] = 0,
-    limit: Optional[int] = 10
-) -> List[BookSchema]:
-    return await book_service.get_books(
+    limit: Optional[int] = 10,
+    cursor: Optional[str] = Query(None, description="Value of X-Next-Cursor from the previous page, replaces skip"),
+    total: bool = Query(False, description="Adds X-Total-Count, an estimate on big filtered lists (X-Total-Count-Estimated)"),
+) -> Response:
+    page, validators = await book_service.get_books_page(
         session=session, 
         skip=skip, 
         limit=limit,
         filters=filters,
         sorting=sorting,
+        cursor=cursor,
+        conditions=conditions,
+        fields=fields,
+    )
+    if page is None:
+        return not_modified_response(validators)
+    # the body is already serialized (and possibly cached), so it skips response_model
+    headers = validators.headers()
+    if page.next_cursor:
+        headers["X-Next-Cursor"] = page.next_cursor
+    if total:
+        count, exact = await book_service.count_books(session=session, filters=filters)
+        headers["X-Total-Count"] = str(count)
+        if not exact:
+            headers["X-Total-Count-Estimated"] = "true"
+    return FastJSONResponse(content=page.body, headers=headers)
+
+@router.get(
+    '/search/', 
+    response_model=List[BookSchema], 
+    description="Typo-tolerant title search, results are ranked by similarity",
+)
+@limiter.limit("5/minute")  # 5 requests in a minute
+async def search_books(
+    request: Request,
+    session: SessionDep,
+    book_service: BookServiceDep,
+    filters: FiltersDep,
+    query: str = Query(..., min_length=1, max_length=255),
+    skip: Optional[int] = 0,
+    limit: Optional[int] = 10,
+) -> Response:
+    books = await book_service.search_books(
+        session=session,
+        search=query,
+        skip=skip,
+        limit=limit,
+        filters=filters,
+    )
+    return FastJSONResponse(content=books_to_json(books))
+
+@router.get("/export/", description="Streams the whole (filtered) catalog, JSON is exported as NDJSON")
+@limiter.limit("5/minute")  # 5 requests in a minute
+async def export_books(
+    request: Request,
+    book_service: BookServiceDep,
+    filters: FiltersDep,
+    file_format: FileFormat = FileFormat.CSV,
+) -> StreamingResponse:
+    return book_service.export_books(
+        filters=filters,
+        file_format=file_format,
     )
 
 @router.get("/download/", description="Enter only file name without folders")
@@ -43,11 +121,69 @@ async def download_album_photo(
     request: Request,
     file_name: str,
     book_service: BookServiceDep,
+    conditions: ConditionalDep,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    accept_encoding: Optional[str] = Header(None, alias="Accept-Encoding"),
 ) -> Response:
     return await book_service.download_book_file(
-        file_name=file_name
+        file_name=file_name,
+        range_header=range_header,
+        accept_encoding=accept_encoding,
+        conditions=conditions,
     )
     
+@router.get(
+    '/{book_id}/download-url/', 
+    response_model=BookDownloadUrlSchema,
+    description="Presigned url to download the book file straight from S3",
+)
+@limiter.limit("5/minute")  # 5 requests in a minute
+async def get_book_download_url(
+    request: Request,
+    session: SessionDep,
+    book_service: BookServiceDep,
+    book_id: ValidateBookIdDep,
+) -> BookDownloadUrlSchema:
+    return await book_service.create_download_url(
+        session=session,
+        book_id=book_id
+    )
+
+@router.get(
+    '/batch/',
+    response_model=List[BookSchema],
+    description="Several books in one request, in the order of ids; missing ids are skipped",
+)
+@limiter.limit("5/minute")  # 5 requests in a minute
+async def get_books_by_ids(
+    request: Request,
+    session: SessionDep,
+    book_service: BookServiceDep,
+    book_ids: ValidateBookIdsDep,
+) -> Response:
+    books = await book_service.get_books_by_ids(
+        session=session,
+        book_ids=book_ids,
+    )
+    return FastJSONResponse(content=books_to_json(books))
+
+@router.get(
+    '/facets/',
+    response_model=BookFacetsSchema,
+    description="Book counts per genre, published year and author of the filtered catalog",
+)
+@limiter.limit("5/minute")  # 5 requests in a minute
+async def get_book_facets(
+    request: Request,
+    session: SessionDep,
+    book_service: BookServiceDep,
+    filters: FiltersDep,
+) -> BookFacetsSchema:
+    return await book_service.get_facets(
+        session=session,
+        filters=filters,
+    )
+
 @router.get('/{book_id}/', response_model=BookSchema)
 @limiter.limit("5/minute")  # 5 requests in a minute
 async def get_book_by_id(
@@ -55,11 +191,17 @@ async def get_book_by_id(
     session: SessionDep,
     book_service: BookServiceDep,
     book_id: ValidateBookIdDep,
-) -> BookSchema:
-    return await book_service.get_book_by_id(
+    conditions: ConditionalDep,
+) -> Response:
+    book = await book_service.get_book_by_id(
         session=session,
         book_id=book_id
     )
+    # served from the book cache most of the time, so a 304 costs no query
+    validators = Validators(etag=version_etag(book.id, book.updated_at.isoformat()), last_modified=book.updated_at)
+    if conditions.not_modified(validators):
+        return not_modified_response(validators)
+    return FastJSONResponse(content=book_to_json(book), headers=validators.headers())
 
 @router.post('/', response_model=BookNewSchema, status_code=status.HTTP_201_CREATED)
 @limiter.limit("5/minute")  # 5 requests in a minute
@@ -82,6 +224,61 @@ async def create_book(
         book_file=book_file
     )
 
+@router.post(
+    '/upload-url/', 
+    response_model=BookUploadUrlSchema,
+    description="Presigned url to PUT the book file straight to S3 (send the returned content_type), then call /finalize/",
+)
+@limiter.limit("5/minute")  # 5 requests in a minute
+async def create_book_upload_url(
+    request: Request,
+    book_service: BookServiceDep,
+    author: UserDep,
+    upload: BookUploadUrlRequestSchema,
+) -> BookUploadUrlSchema:
+    return book_service.create_upload_url(
+        file_name=upload.file_name
+    )
+
+@router.post('/finalize/', response_model=BookNewSchema, status_code=status.HTTP_201_CREATED)
+@limiter.limit("5/minute")  # 5 requests in a minute
+async def finalize_book_upload(
+    request: Request,
+    session: SessionDep,
+    book_service: BookServiceDep,
+    author: UserDep,
+    book_insert: BookCreateSchema,
+) -> BookNewSchema:
+    return await book_service.finalize_book_upload(
+        session=session,
+        book_insert=book_insert,
+        author_id=author.id,
+    )
+
+@router.post(
+    '/import/', 
+    response_model=BookImportResultSchema, 
+    status_code=status.HTTP_201_CREATED,
+    description="Bulk import of book metadata from a CSV or JSON (array or newline-delimited) file",
+)
+@limiter.limit("5/minute")  # 5 requests in a minute
+async def import_books(
+    request: Request,
+    session: SessionDep,
+    book_service: BookServiceDep,
+    author: UserDep,
+    file: UploadFile = File(...),
+    batch_size: int = Query(IMPORT_BATCH_SIZE, gt=0, le=MAX_IMPORT_BATCH_SIZE),
+    file_format: Optional[FileFormat] = Query(None, description="Detected from the file name when omitted"),
+) -> BookImportResultSchema:
+    return await book_service.import_books(
+        session=session,
+        import_file=file,
+        author_id=author.id,
+        batch_size=batch_size,
+        file_format=file_format,
+    )
+
 @router.patch('/{book_id}/', response_model=BookNewSchema)
 @limiter.limit("5/minute")  # 5 requests in a minute
 async def update_book(
@@ -105,6 +302,25 @@ async def update_book(
         book_new_file=book_new_file,
     )
 
+@router.delete(
+    '/batch/',
+    response_model=BookBatchDeleteResultSchema,
+    description="Deletes several of your books at once, nothing is deleted if one of them is not yours",
+)
+@limiter.limit("5/minute")  # 5 requests in a minute
+async def delete_books(
+    request: Request,
+    session: SessionDep,
+    book_service: BookServiceDep,
+    book_ids: ValidateBookIdsDep,
+    author: UserDep,
+) -> BookBatchDeleteResultSchema:
+    return await book_service.delete_books(
+        session=session,
+        book_ids=book_ids,
+        author_id=author.id,
+    )
+
 @router.delete('/{book_id}/', status_code=status.HTTP_204_NO_CONTENT)
 @limiter.limit("5/minute")  # 5 requests in a minute
 async def delete_book(
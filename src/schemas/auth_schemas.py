@@ -20,6 +20,13 @@ class UserOut(UserBase):
     created_at: datetime
 
 
+class TokenUser(BaseModel):
+    """The user as described by the access token claims, no database record behind it."""
+    id: int
+    name: str
+    email: EmailStr
+
+
 class TokenInfo(BaseModel):
     access_token: str
     refresh_token: str | None = None
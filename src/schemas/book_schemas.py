@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, ConfigDict, field_validator
 
 from schemas.author_schemas import AuthorSchema
@@ -66,4 +66,51 @@ class BookUpdateSchema(BookBaseSchema):
     published_year: Optional[int] = None
     genre: Optional[GenreEnum] = None
     file_path: Optional[str] = None # maybe remove
-    # author_id: Optional[int] = None
\ No newline at end of file
+    # author_id: Optional[int] = None
+
+
+class BookImportErrorSchema(BaseModel):
+    row: int
+    errors: List[dict[str, Any]]
+
+
+class BookImportResultSchema(BaseModel):
+    message: str
+    imported: int
+    failed: int
+    errors: List[BookImportErrorSchema]
+
+
+
+class BookUploadUrlRequestSchema(BaseModel):
+    file_name: str
+
+
+class BookUploadUrlSchema(BaseModel):
+    upload_url: str
+    file_path: str
+    content_type: str
+    expires_in: int
+
+
+class BookDownloadUrlSchema(BaseModel):
+    download_url: str
+    expires_in: int
+
+
+class BookBatchDeleteResultSchema(BaseModel):
+    deleted: List[int]
+    not_found: List[int]
+
+
+class AuthorFacetSchema(BaseModel):
+    id: int
+    name: str
+    count: int
+
+
+class BookFacetsSchema(BaseModel):
+    total: int
+    genre: Dict[GenreEnum, int]
+    published_year: Dict[int, int]
+    author: List[AuthorFacetSchema]
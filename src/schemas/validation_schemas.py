@@ -8,6 +8,7 @@ class BookFilterParams(BaseModel):
     published_year: Optional[int] = None
     author_name: Optional[str] = None
     genre: Optional[GenreEnum] = None
+    q: Optional[str] = None
 
     @field_validator('published_year', mode='after')
     def validate_published_year(cls, v):
@@ -33,12 +34,19 @@ class BookFilterParams(BaseModel):
                 raise ValueError('author_name cannot be a number')
         return v
 
+    @field_validator('q', mode='after')
+    def validate_q(cls, v):
+        if v is not None and len(v.strip()) == 0:
+            raise ValueError('q cannot be empty')
+        return v
+
 class BookSortParams(BaseModel):
     order_by: Optional[str] = "id"
     order_desc: bool = False
 
     @field_validator('order_by', mode='after')
     def validate_order_by(cls, v):
-        if v not in Book.__table__.columns:
-            raise ValueError(f'order_by must be in [{Book.__table__.columns}]')
+        sortable_columns = [column.name for column in Book.__table__.columns if column.name != "search_vector"]
+        if v not in sortable_columns:
+            raise ValueError(f'order_by must be in [{", ".join(sortable_columns)}]')
         return v
\ No newline at end of file
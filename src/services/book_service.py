@@ -1,119 +1,546 @@
-from typing import List, Optional
+import os
+from typing import List, Optional, Sequence, Tuple
 import uuid
-from fastapi import Response, UploadFile
-from constants import BOOK_FOLDER
-from custom_exceptions.book_exceptions import BookDownloadException
+from fastapi import HTTPException, Response, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from constants import (
+    AUTHOR_FACET, BOOK_FOLDER, EXPORT_BATCH_SIZE, FILE_CONTENT_ENCODINGS, GENRE_FACET,
+    MAX_AUTHOR_FACETS, MAX_IMPORT_ERRORS, PUBLISHED_YEAR_FACET,
+)
+from database import session_factory
+from database.records import BookRecord
+from custom_exceptions.book_exceptions import BookDownloadException, BookNotFoundException, InvalidCursorException
 from repositories.book_repository import BookRepository
+from repositories.file_deletion_repository import FileDeletionRepository
 from sqlalchemy.ext.asyncio import AsyncSession
 from custom_exceptions.auth_exceptions import NotEnoughRightsException
-from schemas.book_schemas import BookCreateSchema, BookNewSchema, BookSchema, BookUpdateSchema
+from custom_exceptions.file_exceptions import NoFileFoundException, UploadingFileException
+from config import settings
+from schemas.book_schemas import (
+    AuthorFacetSchema,
+    BookBatchDeleteResultSchema,
+    BookCreateSchema,
+    BookDownloadUrlSchema,
+    BookFacetsSchema,
+    BookImportResultSchema,
+    BookNewSchema,
+    BookSchema,
+    BookUpdateSchema,
+    BookUploadUrlSchema,
+)
 from schemas.validation_schemas import BookFilterParams, BookSortParams
-from utils.enums import GenreEnum
+from utils.cursor_funcs import decode_cursor, get_next_cursor
+from utils.enums import FileFormat, GenreEnum
+from utils.compression_funcs import decompress_stream
+from utils.http_funcs import (
+    ConditionalHeaders,
+    Validators,
+    accepts_encoding,
+    content_etag,
+    not_modified_response,
+    parse_range_header,
+)
+from utils.export_funcs import EXPORT_FILE_NAMES, EXPORT_MEDIA_TYPES, csv_header, rows_to_csv, rows_to_ndjson
+from utils.import_funcs import BookRowReader, get_file_format
+from utils.serialization_funcs import books_to_json
 from aws.s3_actions import s3_client
+from services.file_cleanup_service import file_cleanup_service
+from cache import book_cache, list_cache
+from cache.list_cache import CachedPage, params_hash
 
 class BookService:
     repository = BookRepository
+
+    async def _catalog_changed(self, *book_ids: int) -> None:
+        """Drops the cached copies of the changed books and every cached list page."""
+        await book_cache.invalidate(*book_ids)
+        await list_cache.bump_generation()
     
-    async def _check_book_author(
-        self, session: AsyncSession, book_id: int, author_id: int
-    ) -> None:
-        """Checks that the user is the author of the book, otherwise throws an exception."""
-        book: BookSchema = await self.repository.get_book_by_id(session, book_id)
-        
-        if book.author.id != author_id:
-            raise NotEnoughRightsException()
-    
+    async def _discard_uploaded_file(self, file_path: str) -> None:
+        """Queues an object uploaded for a book write that failed, the worker keeps it if a book uses it by now."""
+        await file_cleanup_service.enqueue([file_path])
+
+    async def _store_book_file(self, book_file: UploadFile) -> Tuple[str, bool]:
+        """
+            Stores the file under books/{sha256}.{ext}, returns the key and whether this call uploaded it.
+            Identical content maps to one object, which is uploaded only if the key isn't in S3 yet.
+            No database session is used here, the upload can take long and must not hold a connection.
+        """
+        file_type = s3_client.get_file_type(book_file.filename)
+        # the size of the spooled upload is usually known, an oversized file isn't worth hashing
+        if book_file.size is not None:
+            s3_client.validate_file_size(book_file.size, file_type)
+        # the upload is already spooled locally, hashing it first is what lets a duplicate skip S3
+        sha256, size = await run_in_threadpool(s3_client.get_file_hash, book_file.file)
+        s3_client.validate_file_size(size, file_type)
+        file_path = s3_client.get_content_addressed_key(BOOK_FOLDER, sha256, file_type)
+
+        if await s3_client.s3_file_exists(file_path):
+            return file_path, False
+        await s3_client.s3_upload_file(file=book_file, key=file_path)
+        return file_path, True
+
     async def create_book(
         self, session: AsyncSession, title: str, 
         published_year: int, genre: GenreEnum, book_file: UploadFile, author_id: int
     ) -> BookNewSchema:
-        file_path = f"{BOOK_FOLDER}/{uuid.uuid4()}_{book_file.filename}"
+        file_path, uploaded = await self._store_book_file(book_file)
         book_insert = BookCreateSchema(title=title, published_year=published_year, genre=genre, file_path=file_path)
-        # insert book file to s3 logic
-        await s3_client.s3_upload_file(
-            file=book_file,
-            key=file_path,
+
+        try:
+            # held until the book write commits, the cleanup worker can't delete the object meanwhile
+            await FileDeletionRepository.lock_stored_files(session=session, file_paths=[file_path])
+            book = await self.repository.create_book(
+                session=session,
+                book_insert=book_insert,
+                author_id=author_id
+            )
+        except Exception:
+            if uploaded:
+                await self._discard_uploaded_file(file_path)
+            raise
+        # the id may have been looked up (and cached as missing) before it existed
+        await self._catalog_changed(book.id)
+        return book
+    
+    def create_upload_url(self, file_name: str) -> BookUploadUrlSchema:
+        """Presigned PUT url, the file goes from the client straight to S3."""
+        file_name = os.path.basename(file_name)
+        content_type = s3_client.get_content_type(s3_client.get_file_type(file_name))
+        file_path = f"{BOOK_FOLDER}/{uuid.uuid4()}_{file_name}"
+        return BookUploadUrlSchema(
+            upload_url=s3_client.s3_presigned_upload_url(
+                key=file_path,
+                content_type=content_type,
+                expires_in=settings.presigned_url_expire_seconds,
+            ),
+            file_path=file_path,
+            content_type=content_type,
+            expires_in=settings.presigned_url_expire_seconds,
         )
 
-        return await self.repository.create_book(
-            session=session,
-            book_insert=book_insert,
-            author_id=author_id
+    async def finalize_book_upload(
+        self, session: AsyncSession, book_insert: BookCreateSchema, author_id: int
+    ) -> BookNewSchema:
+        """Registers a book whose file was uploaded with a presigned url."""
+        if not book_insert.file_path.startswith(f"{BOOK_FOLDER}/") or ".." in book_insert.file_path:
+            raise UploadingFileException(f'Invalid file path {book_insert.file_path}')
+        if await self.repository.file_path_exists(session, book_insert.file_path):
+            raise UploadingFileException(f'File {book_insert.file_path} already belongs to a book')
+
+        # presigned PUT can't limit the size, so it is checked once the object exists
+        s3_object = await s3_client.s3_head_file(book_insert.file_path)
+        try:
+            s3_client.validate_file_size(
+                s3_object['ContentLength'], s3_client.get_file_type(book_insert.file_path)
+            )
+        except HTTPException:
+            await s3_client.s3_delete_file(book_insert.file_path)
+            raise
+
+        try:
+            book = await self.repository.create_book(
+                session=session,
+                book_insert=book_insert,
+                author_id=author_id
+            )
+        except Exception:
+            # the object under the presigned key was uploaded for this book only
+            await self._discard_uploaded_file(book_insert.file_path)
+            raise
+        await self._catalog_changed(book.id)
+        return book
+
+    async def create_download_url(
+        self, session: AsyncSession, book_id: int
+    ) -> BookDownloadUrlSchema:
+        book = await self.get_book_by_id(session, book_id)
+        # imported books carry metadata only
+        if not book.file_path:
+            raise NoFileFoundException(f'Book {book_id} has no file')
+        return BookDownloadUrlSchema(
+            download_url=s3_client.s3_presigned_download_url(
+                key=book.file_path,
+                file_name=os.path.basename(book.file_path),
+                expires_in=settings.presigned_url_expire_seconds,
+            ),
+            expires_in=settings.presigned_url_expire_seconds,
+        )
+
+    async def import_books(
+        self, session: AsyncSession, import_file: UploadFile, author_id: int,
+        batch_size: int, file_format: Optional[FileFormat] = None,
+    ) -> BookImportResultSchema:
+        """Stream-parses a CSV/JSON file and inserts the valid rows batch by batch."""
+        reader = BookRowReader(import_file.file, get_file_format(import_file, file_format))
+        imported, failed, errors = 0, 0, []
+
+        while not reader.exhausted:
+            books, batch_errors = await run_in_threadpool(reader.read_batch, batch_size)
+            book_ids = await self.repository.bulk_create_books(
+                session=session,
+                books_insert=books,
+                author_id=author_id,
+            )
+            if book_ids:
+                await self._catalog_changed(*book_ids)
+            imported += len(book_ids)
+            failed += len(batch_errors)
+            errors.extend(batch_errors[:MAX_IMPORT_ERRORS - len(errors)])
+
+        return BookImportResultSchema(
+            message="success" if imported or failed else "empty",
+            imported=imported,
+            failed=failed,
+            errors=errors,
         )
     
+    async def _raise_write_denied(self, session: AsyncSession, book_id: int) -> None:
+        """A write matched no row: tells a missing book from someone else's book."""
+        await self.get_book_by_id(session, book_id)
+        raise NotEnoughRightsException()
+
     async def update_book(
         self, session: AsyncSession, title: Optional[str], 
         published_year: Optional[int], genre: Optional[GenreEnum], book_new_file: Optional[UploadFile], 
         author_id: int, book_id: int,
     ) -> BookNewSchema:
-        await self._check_book_author(session, book_id, author_id)
-
-        before_update_book = await self.get_book_by_id(session, book_id)
-
-        file_path = f"{BOOK_FOLDER}/{uuid.uuid4()}_{book_new_file.filename}"
-        book_update: BookUpdateSchema = BookUpdateSchema(title=title, published_year=published_year, genre=genre, file_path=file_path)
+        file_path, uploaded = None, False
+        if book_new_file:
+            # the new object goes first, so the book never points at a missing file
+            file_path, uploaded = await self._store_book_file(book_new_file)
 
-        book: BookNewSchema = await self.repository.update_book(
-            session=session,
-            book_update=book_update,
-            book_id=book_id,
-            author_id=author_id
+        book_update: BookUpdateSchema = BookUpdateSchema(
+            title=title, published_year=published_year, genre=genre, file_path=file_path
         )
-        # insert new book file (if hes not none) and delete existing file from s3 logic
-        if book_new_file:
-            await s3_client.s3_update_file(
-                old_key=before_update_book.file_path,
-                new_file=book_new_file,
-                new_key=file_path
+        try:
+            if file_path:
+                # held until the book write commits, the cleanup worker can't delete the object meanwhile
+                await FileDeletionRepository.lock_stored_files(session=session, file_paths=[file_path])
+            book = await self.repository.update_book(
+                session=session,
+                book_update=book_update,
+                book_id=book_id,
+                author_id=author_id
             )
+            if book is None:
+                await self._raise_write_denied(session, book_id)
+        except Exception:
+            if uploaded:
+                await self._discard_uploaded_file(file_path)
+            raise
 
-        return book
+        await self._catalog_changed(book_id)
+        if file_path:
+            # the old object may have lost its last reference, the trigger queued it then
+            file_cleanup_service.notify()
+
+        return BookNewSchema.model_validate(book)
     
     async def delete_book(
-        self, session: AsyncSession, book_id: int, author_id: int
+        self, session: AsyncSession, book_id: int, author_id: int,
     ) -> None:
-        await self._check_book_author(session, book_id, author_id)
-        # delete existing file from s3 logic
         book = await self.repository.delete_book(
             session=session,
-            book_id=book_id
+            book_id=book_id,
+            author_id=author_id,
         )
-        await s3_client.s3_delete_file(book.file_path)
+        if book is None:
+            await self._raise_write_denied(session, book_id)
+
+        await self._catalog_changed(book_id)
+        # the file was queued for deletion by the books_file_refs trigger if no other book shares it
+        file_cleanup_service.notify()
 
     
     async def get_book_by_id(
         self, session: AsyncSession, book_id: int,
     ) -> BookSchema:
-        return await self.repository.get_book_by_id(
+        """Read-through: served from the cache when possible, missing ids are cached as well."""
+        lookup = await book_cache.get(book_id)
+        if lookup.cached:
+            if lookup.book is None:
+                raise BookNotFoundException()
+            return lookup.book
+
+        try:
+            book = BookSchema.model_validate(
+                await self.repository.get_book_by_id(session=session, book_id=book_id),
+                # from_attributes has to reach the nested author as well
+                from_attributes=True,
+            )
+        except BookNotFoundException:
+            await book_cache.set_missing(book_id, lookup.version)
+            raise
+        await book_cache.set(book, lookup.version)
+        return book
+
+    async def get_books_by_ids(
+        self, session: AsyncSession, book_ids: List[int],
+    ) -> List[BookSchema]:
+        """Books in the requested order (missing ids are skipped): cached ones first, one IN query for the rest."""
+        cached, versions = await book_cache.get_many(book_ids)
+        books = {book_id: book for book_id, book in cached.items() if book}
+
+        if not_cached := [book_id for book_id in book_ids if book_id not in cached]:
+            loaded = [
+                BookSchema.model_validate(book, from_attributes=True)
+                for book in await self.repository.get_books_by_ids(session=session, book_ids=not_cached)
+            ]
+            await book_cache.set_many(loaded, versions)
+            books.update((book.id, book) for book in loaded)
+
+        return [books[book_id] for book_id in book_ids if book_id in books]
+
+    async def delete_books(
+        self, session: AsyncSession, book_ids: List[int], author_id: int,
+    ) -> BookBatchDeleteResultSchema:
+        """All or nothing: fails without deleting anything if one of the books belongs to another author."""
+        books, foreign_ids = await self.repository.delete_author_books(
             session=session,
-            book_id=book_id
+            book_ids=book_ids,
+            author_id=author_id,
         )
+        if foreign_ids:
+            raise NotEnoughRightsException(
+                f"You have not enough rights for books {', '.join(map(str, foreign_ids))}"
+            )
+
+        deleted_ids = [book.id for book in books]
+        if deleted_ids:
+            await self._catalog_changed(*deleted_ids)
+            file_cleanup_service.notify()
+
+        deleted = set(deleted_ids)
+        return BookBatchDeleteResultSchema(
+            deleted=deleted_ids,
+            not_found=[book_id for book_id in book_ids if book_id not in deleted],
+        )
+
+    async def warm_up_cache(self, session: AsyncSession, size: int) -> int:
+        """Preloads the most requested books into the cache, returns how many were stored."""
+        book_ids = await book_cache.popular_ids(size)
+        versions = await book_cache.versions(book_ids)
+        books = await self.repository.get_books_by_ids(session=session, book_ids=book_ids)
+        await book_cache.set_many(
+            (BookSchema.model_validate(book, from_attributes=True) for book in books), versions
+        )
+        await book_cache.trim_popular(size)
+        return len(books)
 
     async def get_books(
         self, session: AsyncSession, skip: int, limit: int, 
-        filters: BookFilterParams, sorting: BookSortParams
-    ) -> List[BookSchema]:
-        return await self.repository.get_books(
+        filters: BookFilterParams, sorting: BookSortParams, cursor: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[BookRecord], Optional[str]]:
+        """Returns a page of read-only book records and the cursor of the next page (None on the last page)."""
+        if cursor and filters.q:
+            raise InvalidCursorException("Cursor pagination is not available for relevance-ranked (q) results")
+
+        books = await self.repository.get_book_records(
             session=session, 
             skip=skip, 
             limit=limit,
             filters=filters,
             sorting=sorting,
+            cursor=decode_cursor(cursor, sorting) if cursor else None,
+            fields=fields,
         )
+        return books, None if filters.q else get_next_cursor(books, sorting, limit)
     
+    async def get_books_page(
+        self, session: AsyncSession, skip: int, limit: int, 
+        filters: BookFilterParams, sorting: BookSortParams, cursor: Optional[str] = None,
+        conditions: Optional[ConditionalHeaders] = None, fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[Optional[CachedPage], Validators]:
+        """
+            get_books serialized to JSON with the orjson fast path, a list cache hit skips both SQL and serialization.
+            The page is None when the client's copy is still current, a matching cached ETag answers that without SQL.
+        """
+        conditions = conditions or ConditionalHeaders()
+        key_hash = params_hash(filters, sorting, skip, limit, cursor, fields)
+        lookup = await list_cache.get(key_hash)
+        if lookup.page:
+            # pages cached before ETags existed don't carry one
+            validators = Validators(etag=lookup.page.etag or content_etag(lookup.page.body))
+            return None if conditions.not_modified(validators) else lookup.page, validators
+
+        books, next_cursor = await self.get_books(
+            session=session,
+            skip=skip,
+            limit=limit,
+            filters=filters,
+            sorting=sorting,
+            cursor=cursor,
+            fields=fields,
+        )
+        body = books_to_json(books, fields)
+        page = CachedPage(body=body, next_cursor=next_cursor, etag=content_etag(body))
+        if lookup.generation is not None:
+            await list_cache.set(lookup.generation, key_hash, page)
+        validators = Validators(etag=page.etag)
+        return None if conditions.not_modified(validators) else page, validators
+    
+    async def count_books(
+        self, session: AsyncSession, filters: BookFilterParams,
+    ) -> Tuple[int, bool]:
+        """
+            Total of the filtered list and whether it is exact,
+            a planner estimate from settings.exact_count_threshold rows on.
+        """
+        return await self.repository.count_books(
+            session=session,
+            filters=filters,
+            exact_threshold=settings.exact_count_threshold,
+        )
+
+    async def get_facets(
+        self, session: AsyncSession, filters: BookFilterParams,
+    ) -> BookFacetsSchema:
+        """
+            Book counts per genre, published year and author (the MAX_AUTHOR_FACETS biggest)
+            of the filtered catalog. Without filters they are read from the trigger-maintained
+            counters, filtered ones take one grouped scan.
+        """
+        genre, published_year, authors = {}, {}, []
+        if not filters.model_dump(exclude_none=True):
+            for row in await self.repository.get_facet_counts(session=session, max_authors=MAX_AUTHOR_FACETS):
+                if row.facet == GENRE_FACET:
+                    genre[GenreEnum(row.value)] = row.count
+                elif row.facet == PUBLISHED_YEAR_FACET:
+                    published_year[int(row.value)] = row.count
+                elif row.facet == AUTHOR_FACET and row.author_name is not None:
+                    authors.append(
+                        AuthorFacetSchema(id=int(row.value), name=row.author_name, count=row.count)
+                    )
+        else:
+            for row in await self.repository.get_filtered_facet_counts(session=session, filters=filters):
+                # grouping() bits are set for the columns left out of the row's grouping set
+                if row.grouping == 0b011:
+                    genre[row.genre] = row.count
+                elif row.grouping == 0b101:
+                    published_year[row.published_year] = row.count
+                else:
+                    authors.append(AuthorFacetSchema(id=row.author_id, name=row.author_name, count=row.count))
+
+        authors.sort(key=lambda author: (-author.count, author.id))
+        return BookFacetsSchema(
+            # every book has exactly one genre
+            total=sum(genre.values()),
+            genre=dict(sorted(genre.items(), key=lambda item: -item[1])),
+            published_year=dict(sorted(published_year.items(), reverse=True)),
+            author=authors[:MAX_AUTHOR_FACETS],
+        )
+
+    async def search_books(
+        self, session: AsyncSession, search: str, skip: int, limit: int, 
+        filters: BookFilterParams,
+    ) -> List[BookSchema]:
+        return await self.repository.search_books(
+            session=session,
+            search=search,
+            filters=filters,
+            skip=skip,
+            limit=limit,
+        )
+
+    def export_books(
+        self, filters: BookFilterParams, file_format: FileFormat
+    ) -> StreamingResponse:
+        """Streams the (filtered) catalog as CSV or NDJSON straight from a server-side cursor."""
+        serialize = rows_to_csv if file_format == FileFormat.CSV else rows_to_ndjson
+
+        async def content():
+            # the request session is closed before the body is sent,
+            # so the stream keeps its own session for the whole transfer
+            async with session_factory() as session:
+                if file_format == FileFormat.CSV:
+                    yield csv_header()
+                async for rows in self.repository.stream_books(
+                    session=session,
+                    filters=filters,
+                    batch_size=EXPORT_BATCH_SIZE,
+                ):
+                    yield serialize(rows)
+
+        return StreamingResponse(
+            content(),
+            media_type=EXPORT_MEDIA_TYPES[file_format],
+            headers={'Content-Disposition': f'attachment;filename={EXPORT_FILE_NAMES[file_format]}'},
+        )
+    
+    @staticmethod
+    def _file_etag(tag: str, encoding: Optional[str]) -> str:
+        # each encoding of the same content is a representation of its own
+        return f'"{tag}-{encoding}"' if encoding else f'"{tag}"'
+
     async def download_book_file(
-        self, file_name: str
+        self, file_name: str, range_header: Optional[str] = None, accept_encoding: Optional[str] = None,
+        conditions: Optional[ConditionalHeaders] = None,
     ) -> Response:
+        """
+            Streams the file from S3 in chunks, a single Range is forwarded to S3 and answered with 206.
+            Compressed objects are passed through with their Content-Encoding when the client accepts it
+            and decompressed while streaming otherwise; a range can't be served from decompressed bytes.
+            A content-addressed key is its own validator, so a matching If-None-Match is answered
+            with 304 without asking S3.
+        """
+        conditions = conditions or ConditionalHeaders()
+        stored_encoding = FILE_CONTENT_ENCODINGS.get(os.path.splitext(file_name)[1].lstrip('.').lower())
+        decompress = stored_encoding is not None and not accepts_encoding(accept_encoding, stored_encoding)
+        headers = {'Content-Disposition': f'attachment;filename={file_name}'}
+        if stored_encoding:
+            headers['Vary'] = 'Accept-Encoding'
+
+        sha256 = s3_client.get_content_hash(file_name)
+        if sha256 and conditions.if_none_match:
+            validators = Validators(etag=self._file_etag(sha256, None if decompress else stored_encoding))
+            if conditions.not_modified(validators):
+                return not_modified_response(validators, headers)
+
         try:
-            contents = await s3_client.s3_download_file(
+            s3_object = await s3_client.s3_open_file(
                 key=f"{BOOK_FOLDER}/{file_name}",
+                byte_range=None if decompress else parse_range_header(range_header),
+            )
+            # objects uploaded before compression was enabled are stored as they are
+            encoding = s3_object.get('ContentEncoding')
+            response_encoding = None if decompress else encoding
+            tag = sha256 or s3_object.get('ETag', '').strip('"')
+            validators = Validators(
+                etag=self._file_etag(tag, response_encoding) if tag else None,
+                last_modified=s3_object.get('LastModified'),
             )
-            return Response(
-                content=contents,
-                headers={
-                    'Content-Disposition': f'attachment;filename={file_name}',
-                    'Content-Type': 'application/octet-stream',
-                }
+            headers.update(validators.headers())
+            if conditions.not_modified(validators):
+                s3_object['Body'].close()
+                return not_modified_response(validators, headers)
+
+            body = s3_client.iter_file_body(s3_object['Body'])
+            if encoding and decompress:
+                # the decoded length isn't known up front, the body goes out chunked
+                headers['Accept-Ranges'] = 'none'
+                return StreamingResponse(
+                    decompress_stream(body, encoding), media_type='application/octet-stream', headers=headers
+                )
+
+            headers['Accept-Ranges'] = 'bytes'
+            headers['Content-Length'] = str(s3_object['ContentLength'])
+            if encoding:
+                headers['Content-Encoding'] = encoding
+            status_code = status.HTTP_200_OK
+            if s3_object.get('ContentRange'):
+                headers['Content-Range'] = s3_object['ContentRange']
+                status_code = status.HTTP_206_PARTIAL_CONTENT
+
+            return StreamingResponse(
+                body,
+                status_code=status_code,
+                media_type='application/octet-stream',
+                headers=headers,
             )
+        except HTTPException:
+            raise
         except Exception as e:
-            raise BookDownloadException(e)
+            raise BookDownloadException(str(e))
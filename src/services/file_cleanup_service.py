@@ -0,0 +1,133 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Sequence
+
+from sqlalchemy import func, select
+
+from aws.s3_actions import s3_client
+from config import settings
+from constants import BOOK_FOLDER, FILE_DELETION_BATCH_SIZE, FILE_RECONCILE_LOCK_ID
+from database import session_factory
+from database.database import engine
+from repositories.file_deletion_repository import FileDeletionRepository
+
+
+logger = logging.getLogger(__name__)
+
+
+class FileCleanupService:
+    """
+        Deletes S3 objects that no book references any more, off the request path.
+        The books_file_refs trigger queues a key in pending_file_deletions once no book
+        points at it any more, within the same transaction as the write; the worker drains
+        the queue in batched delete_objects calls and periodically reconciles the bucket
+        listing with books.file_path to catch anything missed.
+    """
+    repository = FileDeletionRepository
+
+    def __init__(self):
+        self._wake_up = asyncio.Event()
+
+    def notify(self) -> None:
+        """Wakes the worker of this process up instead of waiting for the next poll."""
+        self._wake_up.set()
+
+    async def enqueue(self, file_paths: Sequence[str]) -> None:
+        async with session_factory() as session:
+            await self.repository.enqueue(session=session, file_paths=file_paths)
+        self.notify()
+
+    async def drain(self, batch_size: int = FILE_DELETION_BATCH_SIZE) -> int:
+        """Processes the due deletions batch by batch, returns how many objects were deleted."""
+        deleted = 0
+        while True:
+            async with session_factory() as session:
+                batch = await self.repository.claim_batch(session=session, batch_size=batch_size)
+                if not batch:
+                    await session.rollback()
+                    return deleted
+
+                # a key may have been referenced again since it was queued, it stays in the bucket;
+                # the lock keeps an upload dedup from reusing it until the batch is finished
+                file_paths = {row.file_path for row in batch}
+                referenced = await self.repository.lock_stored_files(session=session, file_paths=file_paths)
+                keys = list(file_paths - referenced)
+                try:
+                    failed_keys = set(await s3_client.s3_delete_files(keys))
+                except Exception as e:
+                    logger.warning("Deleting %s files failed: %s", len(keys), e)
+                    failed_keys = set(keys)
+
+                await self.repository.finish_batch(
+                    session=session,
+                    done_ids=[row.id for row in batch if row.file_path not in failed_keys],
+                    failed_ids=[row.id for row in batch if row.file_path in failed_keys],
+                    file_paths=list(file_paths),
+                    retry_delay=timedelta(seconds=settings.file_deletion_retry_seconds),
+                )
+                deleted += len(keys) - len(failed_keys)
+                if failed_keys or len(batch) < batch_size:
+                    # the failed rows are postponed, nothing else is due right now
+                    return deleted
+
+    async def reconcile(self, grace_period: Optional[timedelta] = None) -> int:
+        """
+            Streams the bucket listing page by page and queues the objects no book points at.
+            Objects younger than the grace period are skipped, they may belong to an upload in progress
+            (presigned or multipart) whose book row doesn't exist yet. Returns how many were queued.
+        """
+        grace_period = grace_period or timedelta(seconds=settings.file_reconcile_grace_seconds)
+        # one reconciliation at a time across all workers; a session level lock needs
+        # a connection of its own, the session releases its connection on every commit
+        async with engine.connect() as lock_connection:
+            if not await lock_connection.scalar(select(func.pg_try_advisory_lock(FILE_RECONCILE_LOCK_ID))):
+                return 0
+            try:
+                return await self._reconcile(datetime.now(timezone.utc) - grace_period)
+            finally:
+                await lock_connection.scalar(select(func.pg_advisory_unlock(FILE_RECONCILE_LOCK_ID)))
+
+    async def _reconcile(self, older_than: datetime) -> int:
+        orphans = 0
+        async with session_factory() as session:
+            async for objects in s3_client.s3_list_files(prefix=f"{BOOK_FOLDER}/"):
+                keys = [obj["Key"] for obj in objects if obj["LastModified"] < older_than]
+                referenced = await self.repository.get_referenced_file_paths(session=session, file_paths=keys)
+                if orphan_keys := [key for key in keys if key not in referenced]:
+                    await self.repository.enqueue(session=session, file_paths=orphan_keys)
+                    orphans += len(orphan_keys)
+                # don't keep a transaction open while waiting for the next page
+                await session.rollback()
+        if orphans:
+            logger.info("Reconciliation queued %s orphaned files", orphans)
+            self.notify()
+        return orphans
+
+    async def run(self) -> None:
+        """The background worker: drains the queue on notification or every poll interval, reconciles periodically."""
+        loop = asyncio.get_running_loop()
+        next_reconcile = (
+            loop.time() + settings.file_reconcile_interval_seconds
+            if settings.file_reconcile_interval_seconds > 0 else None
+        )
+        while True:
+            # cleared before draining, so a notification that comes in meanwhile isn't lost
+            self._wake_up.clear()
+            try:
+                await self.drain()
+                if next_reconcile is not None and loop.time() >= next_reconcile:
+                    next_reconcile = loop.time() + settings.file_reconcile_interval_seconds
+                    await self.reconcile()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("File cleanup failed: %s", e)
+
+            try:
+                await asyncio.wait_for(self._wake_up.wait(), timeout=settings.file_deletion_poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+
+file_cleanup_service = FileCleanupService()
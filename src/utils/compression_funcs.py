@@ -0,0 +1,33 @@
+import zlib
+from typing import AsyncIterator
+
+from fastapi.concurrency import run_in_threadpool
+
+from constants import FILE_COMPRESSION_LEVEL
+
+
+# zlib wbits for the gzip container
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def get_compressor(encoding: str, level: int = FILE_COMPRESSION_LEVEL):
+    """Incremental compressor for the Content-Encoding, fed chunk by chunk and flushed at the end."""
+    if encoding == "gzip":
+        return zlib.compressobj(level, zlib.DEFLATED, _GZIP_WBITS)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def get_decompressor(encoding: str):
+    if encoding == "gzip":
+        return zlib.decompressobj(_GZIP_WBITS)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+async def decompress_stream(chunks: AsyncIterator[bytes], encoding: str) -> AsyncIterator[bytes]:
+    """Decodes an encoded byte stream on the fly, memory stays bounded by the chunk size."""
+    decompressor = get_decompressor(encoding)
+    async for chunk in chunks:
+        if data := await run_in_threadpool(decompressor.decompress, chunk):
+            yield data
+    if data := decompressor.flush():
+        yield data
@@ -0,0 +1,55 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from custom_exceptions.book_exceptions import InvalidCursorException
+from database.models import Book
+from schemas.validation_schemas import BookSortParams
+from utils.serialization_funcs import plain_value
+
+
+def _decode_value(value: Any, order_by: str) -> Any:
+    python_type = Book.__table__.columns[order_by].type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(book: Any, sorting: BookSortParams) -> str:
+    """Builds an opaque cursor pointing right after the given book."""
+    payload = {
+        "o": sorting.order_by,
+        "d": sorting.order_desc,
+        "v": plain_value(getattr(book, sorting.order_by)),
+        "i": book.id,
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sorting: BookSortParams) -> Tuple[Any, int]:
+    """Returns the (order column value, id) pair the next page starts after."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        order_by, order_desc = payload["o"], payload["d"]
+        value, last_id = payload["v"], int(payload["i"])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursorException()
+
+    if order_by != sorting.order_by or order_desc != sorting.order_desc:
+        raise InvalidCursorException("Cursor does not match the current sorting")
+
+    try:
+        return _decode_value(value, order_by), last_id
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursorException()
+
+
+def get_next_cursor(books: list, sorting: BookSortParams, limit: int) -> Optional[str]:
+    """Returns the cursor of the following page, or None when this page is the last one."""
+    if not books or len(books) < limit:
+        return None
+    return encode_cursor(books[-1], sorting)
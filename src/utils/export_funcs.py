@@ -0,0 +1,53 @@
+import csv
+import io
+import json
+from typing import Sequence
+
+from sqlalchemy import Row
+
+from utils.enums import FileFormat
+from utils.serialization_funcs import plain_value
+
+
+EXPORT_FIELDS = (
+    "id",
+    "title",
+    "published_year",
+    "genre",
+    "author_id",
+    "author_name",
+    "file_path",
+    "created_at",
+    "updated_at",
+)
+
+EXPORT_MEDIA_TYPES = {
+    FileFormat.CSV: "text/csv",
+    FileFormat.JSON: "application/x-ndjson",
+}
+
+EXPORT_FILE_NAMES = {
+    FileFormat.CSV: "books.csv",
+    FileFormat.JSON: "books.ndjson",
+}
+
+
+def csv_header() -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_FIELDS)
+    return buffer.getvalue()
+
+
+def rows_to_csv(rows: Sequence[Row]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([plain_value(getattr(row, field)) for field in EXPORT_FIELDS])
+    return buffer.getvalue()
+
+
+def rows_to_ndjson(rows: Sequence[Row]) -> str:
+    return "".join(
+        json.dumps({field: plain_value(getattr(row, field)) for field in EXPORT_FIELDS}) + "\n"
+        for row in rows
+    )
@@ -0,0 +1,135 @@
+import hashlib
+import re
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import NamedTuple, Optional
+
+from fastapi import Response, status
+
+
+_BYTE_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range_header(range_header: Optional[str]) -> Optional[str]:
+    """
+        Returns the single byte range to forward to the storage, or None when the whole
+        file should be sent. Multiple and malformed ranges are ignored, as RFC 9110 allows.
+    """
+    if not range_header:
+        return None
+
+    match = _BYTE_RANGE_RE.match(range_header.strip())
+    if not match:
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if start and end and int(end) < int(start):
+        return None
+    return f"bytes={start}-{end}"
+
+
+def accepts_encoding(accept_encoding: Optional[str], encoding: str) -> bool:
+    """
+        Whether the Accept-Encoding header allows the response in `encoding`.
+        An explicit entry wins over "*", q=0 refuses the coding (RFC 9110, 12.5.3).
+    """
+    if not accept_encoding:
+        return False
+
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+
+    quality = qualities.get(encoding, qualities.get("*", 0.0))
+    return quality > 0
+
+
+def content_etag(body: bytes) -> str:
+    """Weak ETag of a serialized body: equal JSON, equal tag, whatever produced it."""
+    return f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def version_etag(*parts) -> str:
+    """Weak ETag built from version fields (id, updated_at, ...), no body needed."""
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+def _as_utc(value: datetime) -> datetime:
+    # the database columns are timestamps without time zone, written in UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def format_http_date(value: datetime) -> str:
+    return format_datetime(_as_utc(value).replace(microsecond=0), usegmt=True)
+
+
+def parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    """The date of an If-Modified-Since style header, None when it is missing or malformed."""
+    if not value:
+        return None
+    try:
+        return _as_utc(parsedate_to_datetime(value))
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _opaque_tag(etag: str) -> str:
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of If-None-Match against the current ETag, as RFC 9110 requires for GET."""
+    tag = _opaque_tag(etag)
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or (candidate and _opaque_tag(candidate) == tag):
+            return True
+    return False
+
+
+class Validators(NamedTuple):
+    etag: Optional[str] = None
+    last_modified: Optional[datetime] = None
+
+    def headers(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers["ETag"] = self.etag
+        if self.last_modified:
+            headers["Last-Modified"] = format_http_date(self.last_modified)
+        return headers
+
+
+class ConditionalHeaders(NamedTuple):
+    if_none_match: Optional[str] = None
+    if_modified_since: Optional[str] = None
+
+    def not_modified(self, validators: Validators) -> bool:
+        """Whether a 304 can be sent; If-Modified-Since counts only without If-None-Match (RFC 9110, 13.2.2)."""
+        if self.if_none_match:
+            return validators.etag is not None and etag_matches(self.if_none_match, validators.etag)
+        if validators.last_modified is None:
+            return False
+        since = parse_http_date(self.if_modified_since)
+        # HTTP dates have a resolution of one second
+        return since is not None and _as_utc(validators.last_modified).replace(microsecond=0) <= since
+
+
+def not_modified_response(validators: Validators, headers: Optional[dict] = None) -> Response:
+    """304 without a body, it repeats the validators (and e.g. Vary) of the full response."""
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={**validators.headers(), **(headers or {})},
+    )
@@ -0,0 +1,164 @@
+import codecs
+import csv
+import io
+import json
+import os
+from typing import Any, BinaryIO, Iterator, List, Optional, Tuple
+
+from fastapi import UploadFile
+from pydantic import ValidationError
+
+from constants import IMPORT_CHUNK_SIZE, MAX_IMPORT_ROW_SIZE
+from custom_exceptions.file_exceptions import UnsupportedFileTypeException
+from schemas.book_schemas import BookCreateSchema
+from utils.enums import FileFormat
+from utils.validation_funcs import format_validation_errors
+
+
+FILE_FORMAT_EXTENSIONS = {
+    ".csv": FileFormat.CSV,
+    ".json": FileFormat.JSON,
+    ".ndjson": FileFormat.JSON,
+    ".jsonl": FileFormat.JSON,
+}
+
+FILE_FORMAT_CONTENT_TYPES = {
+    "text/csv": FileFormat.CSV,
+    "application/json": FileFormat.JSON,
+    "application/x-ndjson": FileFormat.JSON,
+}
+
+
+def get_file_format(file: UploadFile, file_format: Optional[FileFormat] = None) -> FileFormat:
+    """Returns the explicitly requested format, otherwise guesses it by extension and content type."""
+    if file_format:
+        return file_format
+
+    ext = os.path.splitext(file.filename or "")[-1].lower()
+    if ext in FILE_FORMAT_EXTENSIONS:
+        return FILE_FORMAT_EXTENSIONS[ext]
+    if file.content_type in FILE_FORMAT_CONTENT_TYPES:
+        return FILE_FORMAT_CONTENT_TYPES[file.content_type]
+
+    raise UnsupportedFileTypeException(f'Unsupported import file: {file.filename}. Use CSV or JSON.')
+
+
+def iter_csv_rows(file: BinaryIO) -> Iterator[dict]:
+    """Yields CSV rows one by one as dicts keyed by the header line."""
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        yield from csv.DictReader(text)
+    finally:
+        # give the underlying file back to its owner instead of closing it
+        text.detach()
+
+
+def iter_json_rows(file: BinaryIO, chunk_size: int = IMPORT_CHUNK_SIZE) -> Iterator[Any]:
+    """
+        Yields the items of a top-level JSON array (or of newline-delimited JSON)
+        one by one, reading the file in chunks instead of loading it whole.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer, pos, eof = "", 0, False
+
+    def read_more() -> bool:
+        nonlocal buffer, pos, eof
+        if eof:
+            return False
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + text_decoder.decode(chunk, final=eof)
+        pos = 0
+        return True
+
+    def peek() -> str:
+        """Returns the next non-whitespace character, or an empty string at the end of file."""
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not read_more():
+                return ""
+
+    def decode_value() -> Any:
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # the value is most likely cut by the chunk border
+                if len(buffer) - pos > MAX_IMPORT_ROW_SIZE or not read_more():
+                    raise
+                continue
+            # a number at the very end of the buffer may continue in the next chunk
+            if end == len(buffer) and read_more():
+                continue
+            pos = end
+            return value
+
+    if peek() != "[":
+        while peek():
+            yield decode_value()
+        return
+
+    pos += 1
+    if peek() == "]":
+        return
+    while True:
+        yield decode_value()
+        separator = peek()
+        if separator == "]":
+            return
+        if separator != ",":
+            raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+        pos += 1
+
+
+def iter_file_rows(file: BinaryIO, file_format: FileFormat) -> Iterator[Any]:
+    if file_format == FileFormat.CSV:
+        return iter_csv_rows(file)
+    return iter_json_rows(file)
+
+
+_END_OF_FILE = object()
+
+
+class BookRowReader:
+    """Reads and validates books from an import file batch by batch."""
+
+    def __init__(self, file: BinaryIO, file_format: FileFormat):
+        self._rows = iter_file_rows(file, file_format)
+        self.row_number = 0
+        self.exhausted = False
+
+    def read_batch(self, batch_size: int) -> Tuple[List[BookCreateSchema], List[dict]]:
+        """Returns up to batch_size valid books and the errors of the rows that failed."""
+        books, errors = [], []
+        try:
+            while len(books) + len(errors) < batch_size:
+                row = next(self._rows, _END_OF_FILE)
+                if row is _END_OF_FILE:
+                    self.exhausted = True
+                    break
+                self.row_number += 1
+
+                if isinstance(row, dict):
+                    # imported books carry metadata only, a file_path in the row is ignored;
+                    # the file is attached later through an upload that checks the key
+                    row = {**row, "file_path": ""}
+                try:
+                    books.append(BookCreateSchema.model_validate(row))
+                except ValidationError as e:
+                    errors.append({"row": self.row_number, "errors": format_validation_errors(e)})
+        except (csv.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+            # the rest of the file can't be parsed reliably after a syntax error
+            self.exhausted = True
+            errors.append({
+                "row": self.row_number + 1,
+                "errors": [{"field": None, "message": f"Could not parse row: {e}", "type": "parse_error"}],
+            })
+        return books, errors
@@ -0,0 +1,40 @@
+import re
+from typing import Iterable
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class UploadSizeLimitMiddleware:
+    """
+        Rejects uploads by their Content-Length before the body is received,
+        otherwise the whole file would be spooled to disk before the endpoint sees it.
+    """
+
+    def __init__(
+        self, app: ASGIApp, max_body_size: int, path_pattern: str,
+        methods: Iterable[str] = ("POST", "PATCH"),
+    ):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.path_re = re.compile(path_pattern)
+        self.methods = set(methods)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] == "http"
+            and scope["method"] in self.methods
+            and self.path_re.match(scope["path"])
+        ):
+            content_length = Headers(scope=scope).get("content-length", "")
+            if content_length.isdigit() and int(content_length) > self.max_body_size:
+                response = JSONResponse(
+                    {"detail": f"Request body is larger than {self.max_body_size} bytes"},
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                )
+                await response(scope, receive, send)
+                return
+
+        await self.app(scope, receive, send)
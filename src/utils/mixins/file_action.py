@@ -1,11 +1,18 @@
+import hashlib
 import mimetypes
 import os
-from constants import MAX_FILE_SIZES, SUPPORTED_FILE_TYPES
+import re
+from typing import BinaryIO, Optional, Tuple
+from constants import MAX_FILE_SIZES, SUPPORTED_FILE_TYPES, UPLOAD_PART_SIZE
 from fastapi import HTTPException
 
 from custom_exceptions.file_exceptions import UnexpectedFileError, UnsupportedFileSizeException, UnsupportedFileTypeException
 
 
+# books/{sha256}.{ext}
+CONTENT_ADDRESSED_KEY = re.compile(r"^(?:.*/)?(?P<sha256>[0-9a-f]{64})\.[a-z0-9]+$")
+
+
 class FileActionMixin:
     @staticmethod
     def get_file_type(file_name: str) -> str:
@@ -32,4 +39,33 @@ class FileActionMixin:
     def validate_file_size(size: int, file_type: str) -> None:
         max_file_size = MAX_FILE_SIZES[file_type]
         if not 0 <= size <= max_file_size:
-            raise UnsupportedFileSizeException(f'Supported {file_type} file size is 0 - {max_file_size} KB')
\ No newline at end of file
+            raise UnsupportedFileSizeException(f'Supported {file_type} file size is 0 - {max_file_size} KB')
+
+    @staticmethod
+    def get_content_type(file_type: str) -> str:
+        for file_types in SUPPORTED_FILE_TYPES.values():
+            for content_type, supported_type in file_types.items():
+                if supported_type == file_type:
+                    return content_type
+        raise UnsupportedFileTypeException(f'Unsupported file type: {file_type}.')
+
+    @staticmethod
+    def get_file_hash(file: BinaryIO, chunk_size: int = UPLOAD_PART_SIZE) -> Tuple[str, int]:
+        """SHA-256 hex digest and size of the file, read chunk by chunk; rewinds the file afterwards."""
+        digest, size = hashlib.sha256(), 0
+        file.seek(0)
+        while chunk := file.read(chunk_size):
+            digest.update(chunk)
+            size += len(chunk)
+        file.seek(0)
+        return digest.hexdigest(), size
+
+    @staticmethod
+    def get_content_addressed_key(folder: str, sha256: str, file_type: str) -> str:
+        return f"{folder}/{sha256}.{file_type}"
+
+    @staticmethod
+    def get_content_hash(key: str) -> Optional[str]:
+        """The SHA-256 a content-addressed key (or its file name) carries, None for other keys."""
+        match = CONTENT_ADDRESSED_KEY.match(key)
+        return match.group("sha256") if match else None
@@ -0,0 +1,12 @@
+from typing import Any
+
+from fastapi.responses import ORJSONResponse
+
+
+class FastJSONResponse(ORJSONResponse):
+    """orjson-backed JSON response, bytes are sent as they are (already serialized JSON)."""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return super().render(content)
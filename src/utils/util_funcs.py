@@ -1,8 +1,10 @@
 from typing import Optional
+from fastapi import Header, Query
 from pydantic import ValidationError
 
 from schemas.validation_schemas import BookFilterParams, BookSortParams
 from utils.enums import GenreEnum
+from utils.http_funcs import ConditionalHeaders
 from utils.validation_funcs import handle_validation_error
 
 
@@ -10,7 +12,8 @@ def get_filters(
     title: Optional[str] = None,
     published_year: Optional[int] = None,
     author_name: Optional[str] = None,
-    genre: Optional[GenreEnum] = None
+    genre: Optional[GenreEnum] = None,
+    q: Optional[str] = Query(None, description="Full-text search over titles (websearch syntax), ranks results by relevance"),
 ) -> BookFilterParams:
     try:
         return BookFilterParams(
@@ -18,6 +21,7 @@ def get_filters(
             published_year=published_year,
             author_name=author_name,
             genre=genre,
+            q=q,
         )
     except ValidationError as e:
         handle_validation_error(e)
@@ -34,3 +38,10 @@ def get_sorting(
         )
     except ValidationError as e:
         handle_validation_error(e)
+
+
+def get_conditional_headers(
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    if_modified_since: Optional[str] = Header(None, alias="If-Modified-Since"),
+) -> ConditionalHeaders:
+    return ConditionalHeaders(if_none_match=if_none_match, if_modified_since=if_modified_since)
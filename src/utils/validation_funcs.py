@@ -1,21 +1,61 @@
-from fastapi import HTTPException, Path, status
+from typing import List, Optional, Tuple
+from fastapi import HTTPException, Path, Query, status
 from pydantic import ValidationError
 
+from constants import MAX_BATCH_BOOK_IDS
+from utils.serialization_funcs import BOOK_FIELDS
 
-def handle_validation_error(e: ValidationError):
+
+def format_validation_errors(e: ValidationError) -> list[dict]:
     errors = []
     for error in e.errors():
         errors.append({
-            "field": error["loc"][-1],  
+            "field": error["loc"][-1] if error["loc"] else None,  
             "message": error["msg"],    
             "type": error["type"],
         })
+    return errors
+
+def handle_validation_error(e: ValidationError):
     raise HTTPException(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-        detail=errors,
+        detail=format_validation_errors(e),
     )
 
 def validate_book_id(book_id: int = Path(..., gt=0)) -> int:
     if book_id <= 0:
         raise HTTPException(status_code=422, detail="book_id must be greater than 0")
     return book_id
+
+def validate_book_ids(
+    ids: List[str] = Query(..., description=f"Book ids, repeated (ids=1&ids=2) or comma separated, up to {MAX_BATCH_BOOK_IDS}"),
+) -> List[int]:
+    try:
+        book_ids = [int(book_id) for value in ids for book_id in value.split(",") if book_id.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids must be integers")
+    if not book_ids or any(book_id <= 0 for book_id in book_ids):
+        raise HTTPException(status_code=422, detail="ids must be greater than 0")
+    # duplicates are dropped, the order is kept
+    book_ids = list(dict.fromkeys(book_ids))
+    if len(book_ids) > MAX_BATCH_BOOK_IDS:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_BATCH_BOOK_IDS} ids per request")
+    return book_ids
+
+def validate_book_fields(
+    fields: Optional[str] = Query(
+        None, description=f"Comma separated subset of {', '.join(BOOK_FIELDS)}; all fields when omitted",
+    ),
+) -> Optional[Tuple[str, ...]]:
+    if fields is None:
+        return None
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    if not requested:
+        raise HTTPException(status_code=422, detail="fields must name at least one field")
+    if unknown := requested.difference(BOOK_FIELDS):
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown fields {', '.join(sorted(unknown))}, fields must be in [{', '.join(BOOK_FIELDS)}]",
+        )
+    # schema order, so equal sets share the serialized shape and the list cache entry
+    return tuple(field for field in BOOK_FIELDS if field in requested)
@@ -3,6 +3,7 @@ from typing import AsyncGenerator
 from httpx import ASGITransport, AsyncClient
 import pytest
 from sqlalchemy import text
+from src.cache import book_cache, list_cache
 from src.config import settings
 from sqlalchemy.ext.asyncio import create_async_engine
 from src.database.database import engine, session_factory
@@ -40,6 +41,9 @@ async def prepare_database():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
+    # ids start over with the new database, cached books would be stale
+    await book_cache.clear()
+    await list_cache.clear()
 
     yield
     await engine.dispose()
@@ -69,8 +73,8 @@ async def test_books(register_user, session):
     author_id = register_user["user_id"] 
 
     books = [
-        Book(title="Book 1", published_year=2020, genre=GenreEnum.BIOGRAPHY, author_id=author_id),
-        Book(title="Book 2", published_year=2021, genre=GenreEnum.FANTASY, author_id=author_id),
+        Book(title="Book 1", file_path="books/book_1.txt", published_year=2020, genre=GenreEnum.BIOGRAPHY, author_id=author_id),
+        Book(title="Book 2", file_path="books/book_2.txt", published_year=2021, genre=GenreEnum.FANTASY, author_id=author_id),
     ]
 
     session.add_all(books)
@@ -83,6 +87,31 @@ async def test_books(register_user, session):
             
     await session.commit()
 
+class FakeBucket:
+    """Keeps uploaded objects in memory, s3_file_exists answers from them."""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = []
+        self.before_put = None
+
+    def put_object(self, Key, Body, **params):
+        if self.before_put:
+            self.before_put()
+        self.objects[Key] = Body
+        self.uploads.append(Key)
+        return True
+
+    async def file_exists(self, key):
+        return key in self.objects
+
+@pytest.fixture
+def fake_bucket(monkeypatch):
+    bucket = FakeBucket()
+    monkeypatch.setattr("services.book_service.s3_client.bucket", bucket)
+    monkeypatch.setattr("services.book_service.s3_client.s3_file_exists", bucket.file_exists)
+    return bucket
+
 @pytest.fixture(scope="session")
 def test_files():
     base_path = os.path.join(os.path.dirname(__file__), 'content')
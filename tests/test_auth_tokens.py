@@ -0,0 +1,31 @@
+import jwt
+import pytest
+from src.auth.utils import decode_jwt, hash_password, password_needs_rehash, validate_password
+from src.config import settings
+from tests.test_auth import API_URL, login_user, password
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_access_token_carries_user_id(register_user, login_user):
+    payload = decode_jwt(login_user["access_token"])
+    assert payload["uid"] == register_user["user_id"]
+    assert payload["sub"] == register_user["email"]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_jwks_contains_token_kid(ac, login_user):
+    response = await ac.get(API_URL + "/jwks/")
+    assert response.status_code == 200
+    kids = [key["kid"] for key in response.json()["keys"]]
+    assert jwt.get_unverified_header(login_user["access_token"])["kid"] in kids
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_password_rehash_on_cost_change():
+    current = await hash_password(password)
+    assert await validate_password(password, current)
+    assert not password_needs_rehash(current)
+
+    outdated = await hash_password(password, rounds=settings.bcrypt_rounds - 1)
+    assert await validate_password(password, outdated)
+    assert password_needs_rehash(outdated)
@@ -1,14 +1,46 @@
+import asyncio
+import gzip
+import hashlib
+import io
+import json
+import logging
+from contextlib import suppress
+from fastapi import HTTPException, UploadFile
 from httpx import AsyncClient
 import pytest
 from pydantic import ValidationError
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.schemas.book_schemas import BookSchema, BookNewSchema
+from src.cache import book_cache
+from src.cache.list_cache import CachedPage, ListCache
+from src.cache.redis_client import redis_client
+from src.custom_exceptions.book_exceptions import BookCreateException
+from src.database.models import Book, PendingFileDeletion
 from src.repositories.book_repository import BookRepository
+from src.repositories.file_deletion_repository import FileDeletionRepository
 from src.schemas.validation_schemas import BookFilterParams, BookSortParams
+from src.services.book_service import BookService
+from src.services.file_cleanup_service import file_cleanup_service
+from src.utils.enums import FileFormat, GenreEnum
+from src.utils.http_funcs import version_etag
+from src.utils.import_funcs import BookRowReader
+from src.utils.mixins.file_action import MAX_FILE_SIZES
+from src.utils.serialization_funcs import books_to_json
 from tests.test_auth import login_user
 
 API_URL = "api/v1/book/"
 
+async def pending_file_deletions(session: AsyncSession) -> list:
+    return (await session.scalars(select(PendingFileDeletion.file_path))).all()
+
+async def add_book(session: AsyncSession, author_id: int, file_path: str) -> Book:
+    book = Book(title="Test Book", file_path=file_path, published_year=2020, genre=GenreEnum.OTHER,
+                author_id=author_id)
+    session.add(book)
+    await session.commit()
+    return book
+
 async def validate_pydantic_schema(data, schema):
     try:
         return schema.model_validate(data)
@@ -33,6 +65,172 @@ async def test_get_book_by_id(ac: AsyncClient, test_books: list):
     validated_book = await validate_pydantic_schema(data, BookSchema)
     assert validated_book.id == book_id
 
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_book_by_id_is_cached(ac: AsyncClient, test_books: list, monkeypatch):
+    get_book_by_id = BookRepository.get_book_by_id
+    lookups = []
+
+    async def counting_get_book_by_id(session, book_id):
+        lookups.append(book_id)
+        return await get_book_by_id(session, book_id)
+
+    monkeypatch.setattr(
+        "services.book_service.BookService.repository.get_book_by_id", staticmethod(counting_get_book_by_id)
+    )
+
+    # cached by test_get_book_by_id
+    response = await ac.get(f"{API_URL}{test_books[0].id}/")
+    assert response.status_code == 200
+    # the miss is cached too
+    for _ in range(2):
+        response = await ac.get(f"{API_URL}999999/")
+        assert response.status_code == 404
+    assert lookups == [999999]
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_book_cache_skips_stale_fill():
+    book_id = 888888
+    lookup = await book_cache.get(book_id)
+    assert not lookup.cached
+
+    # a write lands between the database read and the fill
+    await book_cache.invalidate(book_id)
+    await book_cache.set_missing(book_id, lookup.version)
+    lookup = await book_cache.get(book_id)
+    assert not lookup.cached
+
+    await book_cache.set_missing(book_id, lookup.version)
+    assert (await book_cache.get(book_id)).cached
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_book_cache_stats_are_logged(caplog, monkeypatch):
+    async def fake_stats():
+        return {"hits": 3, "misses": 1}
+
+    # the task is cancelled below, that must not happen in the middle of a Redis command
+    monkeypatch.setattr(book_cache, "stats", fake_stats)
+    with caplog.at_level(logging.INFO):
+        task = asyncio.create_task(book_cache.log_stats(0.01))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    assert "Book cache: 3 hits, 1 misses, hit ratio 75.0%" in caplog.text
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_book_by_id_not_modified(ac: AsyncClient, test_books: list, session: AsyncSession):
+    # the rate limit counts per path, /book/{test_books[0].id}/ is used up by the other tests
+    book = test_books[1]
+    await session.refresh(book)
+
+    response = await ac.get(
+        f"{API_URL}{book.id}/",
+        headers={"If-None-Match": version_etag(book.id, book.updated_at.isoformat())},
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == version_etag(book.id, book.updated_at.isoformat())
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_books_by_ids(ac: AsyncClient, test_books: list):
+    ids = [test_books[1].id, 999999, test_books[0].id]
+    response = await ac.get(f"{API_URL}batch/", params={"ids": ",".join(map(str, ids))})
+    assert response.status_code == 200
+    assert [book["id"] for book in response.json()] == [test_books[1].id, test_books[0].id]
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_books_with_cursor(ac: AsyncClient, test_books: list):
+    response = await ac.get(API_URL, params={"limit": 1, "order_by": "title"})
+    assert response.status_code == 200
+    first_page = response.json()
+    assert len(first_page) == 1
+    assert "X-Next-Cursor" in response.headers
+
+    response = await ac.get(
+        API_URL, params={"limit": 1, "order_by": "title", "cursor": response.headers["X-Next-Cursor"]}
+    )
+    assert response.status_code == 200
+    second_page = response.json()
+    assert len(second_page) == 1
+    assert second_page[0]["title"] > first_page[0]["title"]
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_book_records_sparse_fields(test_books: list, session: AsyncSession):
+    records = await BookRepository.get_book_records(
+        session, BookFilterParams(), BookSortParams(), fields=("title",)
+    )
+    assert {book.title for book in test_books} <= {record.title for record in records}
+    # id is selected for the cursor, authors aren't joined
+    assert all(record.id and record.author is None and record.file_path is None for record in records)
+    assert json.loads(books_to_json(records, ("title",)))[0].keys() == {"title"}
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_book_facets(ac: AsyncClient, test_books: list, session: AsyncSession):
+    # the unfiltered facets come from the trigger-maintained counters, they match the table
+    genres = dict((await session.execute(select(Book.genre, func.count()).group_by(Book.genre))).all())
+    response = await ac.get(f"{API_URL}facets/")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["genre"] == {genre.value: count for genre, count in genres.items()}
+    assert data["total"] == sum(genres.values())
+
+    response = await ac.get(f"{API_URL}facets/", params={"genre": "FANTASY"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["genre"] == {"FANTASY": genres[GenreEnum.FANTASY]}
+    assert sum(author["count"] for author in data["author"]) == data["total"]
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_count_books(test_books: list, session: AsyncSession):
+    filters = BookFilterParams(genre="FANTASY")
+    count, exact = await BookRepository.count_books(session, filters, exact_threshold=1_000_000)
+    assert exact and count >= 1
+    # from the threshold on the planner estimate is returned instead
+    _, exact = await BookRepository.count_books(session, filters, exact_threshold=0)
+    assert not exact
+
+@pytest.mark.asyncio(loop_scope="session")
+@pytest.mark.parametrize("compress_min_size", [None, 0])
+async def test_list_cache_generation(compress_min_size):
+    list_cache = ListCache(redis=redis_client, ttl=60, compress_min_size=compress_min_size)
+    page = CachedPage(body=b'[{"id": 1}]', next_cursor="abc", etag='W/"abc"')
+
+    lookup = await list_cache.get("test-page")
+    assert lookup.page is None
+    await list_cache.set(lookup.generation, "test-page", page)
+    assert (await list_cache.get("test-page")) == lookup._replace(page=page)
+
+    # a catalog write makes the page unreachable
+    await list_cache.bump_generation()
+    lookup_after_write = await list_cache.get("test-page")
+    assert lookup_after_write.generation == lookup.generation + 1
+    assert lookup_after_write.page is None
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_books_full_text_search(ac: AsyncClient, test_books: list):
+    # "books" is stemmed to the same lexeme as "Book" in the titles
+    response = await ac.get(API_URL, params={"q": "books", "genre": "FANTASY"})
+    assert response.status_code == 200
+    data = response.json()
+    assert [book["title"] for book in data] == ["Book 2"]
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_export_books(ac: AsyncClient, test_books: list):
+    response = await ac.get(f"{API_URL}export/", params={"file_format": "CSV"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.strip().splitlines()
+    assert lines[0].startswith("id,title")
+    assert len(lines) - 1 == len(test_books)
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_search_books_with_typo(ac: AsyncClient, test_books: list):
+    response = await ac.get(f"{API_URL}search/", params={"query": "Bok 2"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data
+    assert data[0]["title"] == "Book 2"
+
 @pytest.mark.asyncio(loop_scope="session")
 @pytest.mark.parametrize("auth", [True, False])
 async def test_create_book(ac: AsyncClient, login_user, session: AsyncSession, auth):
@@ -63,6 +261,81 @@ async def test_update_book(ac: AsyncClient, test_books: list, login_user, sessio
     else:
         assert response.status_code == 401
 
+@pytest.mark.asyncio(loop_scope="session")
+async def test_update_book_file_queues_old_file(
+    ac: AsyncClient, register_user, login_user, session: AsyncSession, fake_bucket
+):
+    book = await add_book(session, register_user["user_id"], "books/replaced.txt")
+    headers = {"Authorization": f"Bearer {login_user['access_token']}"}
+
+    response = await ac.patch(
+        f"{API_URL}{book.id}/",
+        files={"book_new_file": ("new.txt", b"new content", "text/plain")},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert fake_bucket.uploads == [response.json()["file_path"]]
+    # the old object is deleted later by the file cleanup worker
+    assert "books/replaced.txt" in await pending_file_deletions(session)
+
+    await session.delete(book)
+    await session.commit()
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_same_file_is_stored_once(
+    ac: AsyncClient, register_user, login_user, session: AsyncSession, fake_bucket
+):
+    books = [
+        await add_book(session, register_user["user_id"], f"books/original_{number}.txt")
+        for number in range(2)
+    ]
+    headers = {"Authorization": f"Bearer {login_user['access_token']}"}
+
+    file_paths = []
+    for book in books:
+        response = await ac.patch(
+            f"{API_URL}{book.id}/",
+            files={"book_new_file": ("copy.txt", b"same content", "text/plain")},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        file_paths.append(response.json()["file_path"])
+
+    assert file_paths == [f"books/{hashlib.sha256(b'same content').hexdigest()}.txt"] * 2
+    assert fake_bucket.uploads == file_paths[:1]
+
+    for book in books:
+        await session.delete(book)
+    await session.commit()
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_failed_create_queues_uploaded_file(register_user, session: AsyncSession, fake_bucket, monkeypatch):
+    async def fail_create_book(session, book_insert, author_id):
+        raise BookCreateException("insert failed")
+
+    monkeypatch.setattr("services.book_service.BookRepository.create_book", staticmethod(fail_create_book))
+    book_file = UploadFile(file=io.BytesIO(b"orphaned content"), filename="orphan.txt")
+
+    with pytest.raises(BookCreateException):
+        await BookService().create_book(
+            session, title="Orphan", published_year=2020, genre=GenreEnum.OTHER,
+            book_file=book_file, author_id=register_user["user_id"],
+        )
+    assert fake_bucket.uploads[0] in await pending_file_deletions(session)
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_oversized_file_is_rejected_before_hashing(fake_bucket, monkeypatch):
+    def fail_get_file_hash(file):
+        pytest.fail("the size is known, the file should not be hashed")
+
+    monkeypatch.setattr("services.book_service.s3_client.get_file_hash", fail_get_file_hash)
+    monkeypatch.setitem(MAX_FILE_SIZES, "txt", 4)
+    book_file = UploadFile(file=io.BytesIO(b"too large"), filename="big.txt", size=9)
+
+    with pytest.raises(HTTPException):
+        await BookService()._store_book_file(book_file)
+    assert fake_bucket.uploads == []
+
 @pytest.mark.asyncio(loop_scope="session")
 @pytest.mark.parametrize("auth", [True, False])
 async def test_delete_book(ac: AsyncClient, test_books: list, login_user, session: AsyncSession, auth):
@@ -97,3 +370,191 @@ async def test_import_books_from_file(ac: AsyncClient, login_user, test_files, a
         assert data["message"] == expected_message
     else:
         assert response.status_code == 401
+
+class FakeS3Body:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.closed = False
+
+    def read(self, size: int) -> bytes:
+        chunk, self.data = self.data[:size], self.data[size:]
+        return chunk
+
+    def close(self):
+        self.closed = True
+
+def test_import_ignores_file_path():
+    # an import can't point a book at someone else's (not yet finalized) upload
+    rows = b'[{"title": "Book Four", "published_year": 2020, "genre": "FICTION", "file_path": "books/upload.pdf"}]'
+    books, errors = BookRowReader(io.BytesIO(rows), FileFormat.JSON).read_batch(10)
+    assert not errors
+    assert books[0].file_path == ""
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_download_book_range(ac: AsyncClient, monkeypatch):
+    # S3 answers a ranged GET with just the requested bytes
+    body = FakeS3Body(b"23456")
+    requested_ranges = []
+
+    async def fake_open_file(key, byte_range=None):
+        requested_ranges.append(byte_range)
+        return {"Body": body, "ContentLength": 5, "ContentRange": "bytes 2-6/10"}
+
+    monkeypatch.setattr("services.book_service.s3_client.s3_open_file", fake_open_file)
+
+    response = await ac.get(f"{API_URL}download/", params={"file_name": "book.txt"}, headers={"Range": "bytes=2-6"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 2-6/10"
+    assert response.content == b"23456"
+    assert requested_ranges == ["bytes=2-6"]
+    assert body.closed
+
+@pytest.mark.asyncio(loop_scope="session")
+@pytest.mark.parametrize("accept_encoding, content_encoding", [("gzip", "gzip"), ("identity", None)])
+async def test_download_compressed_book(ac: AsyncClient, monkeypatch, accept_encoding, content_encoding):
+    content = b"a plain text book " * 100
+    compressed = gzip.compress(content)
+    requested_ranges = []
+
+    async def fake_open_file(key, byte_range=None):
+        requested_ranges.append(byte_range)
+        return {"Body": FakeS3Body(compressed), "ContentLength": len(compressed), "ContentEncoding": "gzip"}
+
+    monkeypatch.setattr("services.book_service.s3_client.s3_open_file", fake_open_file)
+
+    response = await ac.get(
+        f"{API_URL}download/",
+        params={"file_name": "book.txt"},
+        headers={"Accept-Encoding": accept_encoding, "Range": "bytes=0-9"},
+    )
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding") == content_encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    # httpx decodes gzip itself, either way the client ends up with the original text
+    assert response.content == content
+    # a range of the decompressed text can't be forwarded to S3
+    assert requested_ranges == ["bytes=0-9" if content_encoding else None]
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_download_not_modified_skips_s3(ac: AsyncClient, monkeypatch):
+    sha256 = hashlib.sha256(b"pdf content").hexdigest()
+
+    async def fail_open_file(key, byte_range=None):
+        pytest.fail("a content-addressed file is validated by its name")
+
+    monkeypatch.setattr("services.book_service.s3_client.s3_open_file", fail_open_file)
+
+    response = await ac.get(
+        f"{API_URL}download/",
+        params={"file_name": f"{sha256}.pdf"},
+        headers={"If-None-Match": f'"{sha256}"'},
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == f'"{sha256}"'
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_cleanup_waits_for_upload_dedup(test_books: list, session: AsyncSession, monkeypatch):
+    file_path = "books/queued-then-reused.txt"
+    deleted = []
+
+    async def fake_delete_files(keys):
+        deleted.extend(keys)
+        return []
+
+    monkeypatch.setattr("src.services.file_cleanup_service.s3_client.s3_delete_files", fake_delete_files)
+    session.add(PendingFileDeletion(file_path=file_path))
+    await session.commit()
+
+    # an upload with the same content found the object and holds the key until its book is written
+    await FileDeletionRepository.lock_stored_files(session, [file_path])
+    drain = asyncio.create_task(file_cleanup_service.drain())
+    await asyncio.sleep(0.3)
+    assert not drain.done()
+
+    book = Book(title="Reused", file_path=file_path, published_year=2020, genre=GenreEnum.OTHER,
+                author_id=test_books[0].author_id)
+    session.add(book)
+    await session.commit()
+    await drain
+    assert file_path not in deleted
+    assert file_path not in await pending_file_deletions(session)
+
+    await session.delete(book)
+    await session.commit()
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_slow_upload_does_not_block_other_requests(
+    ac: AsyncClient, register_user, login_user, session: AsyncSession, fake_bucket
+):
+    loop = asyncio.get_running_loop()
+    entered, release = asyncio.Event(), asyncio.Event()
+
+    def blocking_put():
+        # runs in the S3 executor and stays in the request until the probe below got its answer
+        loop.call_soon_threadsafe(entered.set)
+        asyncio.run_coroutine_threadsafe(release.wait(), loop).result(timeout=5)
+
+    fake_bucket.before_put = blocking_put
+    # the rate limit counts per path, the upload goes to this book's own path
+    book = await add_book(session, register_user["user_id"], "books/before_slow_upload.txt")
+    headers = {"Authorization": f"Bearer {login_user['access_token']}"}
+
+    upload = asyncio.create_task(ac.patch(
+        f"{API_URL}{book.id}/",
+        files={"book_new_file": ("slow.txt", b"slow upload", "text/plain")},
+        headers=headers,
+    ))
+    await asyncio.wait_for(entered.wait(), timeout=5)
+
+    response = await ac.get(API_URL)
+    assert response.status_code == 200
+    assert not upload.done()
+
+    release.set()
+    assert (await upload).status_code == 200
+    await session.delete(book)
+    await session.commit()
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_download_url_needs_a_file(register_user, session: AsyncSession):
+    # imported books are stored without a file
+    book = await add_book(session, register_user["user_id"], "")
+    with pytest.raises(HTTPException) as error:
+        await BookService().create_download_url(session, book.id)
+    assert error.value.status_code == 400
+
+    await session.delete(book)
+    await session.commit()
+
+@pytest.mark.asyncio(loop_scope="session")
+@pytest.mark.parametrize("file_name, status_code", [("book.pdf", 200), ("book.exe", 400)])
+async def test_create_book_upload_url(ac: AsyncClient, login_user, file_name, status_code):
+    headers = {"Authorization": f"Bearer {login_user['access_token']}"}
+    response = await ac.post(f"{API_URL}upload-url/", json={"file_name": file_name}, headers=headers)
+    assert response.status_code == status_code
+    if status_code == 200:
+        data = response.json()
+        assert data["file_path"].startswith("books/")
+        assert data["content_type"] == "application/pdf"
+        assert data["upload_url"]
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_write_route_skips_user_lookup(ac: AsyncClient, login_user, monkeypatch):
+    async def fail_get_user_by_email(session, email):
+        pytest.fail("the user should come from the token claims")
+
+    monkeypatch.setattr("auth.validation.UserRepository.get_user_by_email", staticmethod(fail_get_user_by_email))
+    headers = {"Authorization": f"Bearer {login_user['access_token']}"}
+    response = await ac.post(f"{API_URL}upload-url/", json={"file_name": "book.pdf"}, headers=headers)
+    assert response.status_code == 200
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_delete_books_batch(ac: AsyncClient, test_books: list, login_user, session: AsyncSession):
+    await session.refresh(test_books[1])
+    file_path = test_books[1].file_path
+    headers = {"Authorization": f"Bearer {login_user['access_token']}"}
+
+    response = await ac.delete(f"{API_URL}batch/", params={"ids": [test_books[1].id, 999999]}, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"deleted": [test_books[1].id], "not_found": [999999]}
+    assert file_path in await pending_file_deletions(session)
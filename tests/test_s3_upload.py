@@ -0,0 +1,103 @@
+import gzip
+import io
+import os
+from types import SimpleNamespace
+from fastapi import HTTPException, UploadFile
+from httpx import AsyncClient
+import pytest
+from src.aws.s3_actions import s3_client
+from src.constants import MAX_UPLOAD_REQUEST_SIZE
+from src.utils.mixins.file_action import MAX_FILE_SIZES
+
+
+API_URL = "/api/v1/book/"
+PART_SIZE = 1024
+
+
+class FakeS3Client:
+    """Records the multipart calls instead of sending them to S3."""
+
+    def __init__(self):
+        self.created, self.parts, self.completed, self.aborted = [], [], [], []
+        self.put_objects = []
+
+    def create_multipart_upload(self, Bucket, Key, **params):
+        self.created.append(params)
+        return {"UploadId": "upload-id"}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.parts.append(Body)
+        return {"ETag": f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.completed.append(MultipartUpload["Parts"])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.aborted.append(UploadId)
+
+
+@pytest.fixture
+def fake_s3(monkeypatch):
+    client = FakeS3Client()
+
+    def put_object(**kwargs):
+        client.put_objects.append(kwargs)
+        return True
+
+    monkeypatch.setattr(s3_client, "s3", SimpleNamespace(meta=SimpleNamespace(client=client)))
+    monkeypatch.setattr(s3_client, "bucket", SimpleNamespace(put_object=put_object))
+    monkeypatch.setattr("src.aws.s3_actions.UPLOAD_PART_SIZE", PART_SIZE)
+    return client
+
+
+def upload_file(data: bytes, filename: str) -> UploadFile:
+    # without a size the limit can only be checked while streaming
+    return UploadFile(file=io.BytesIO(data), filename=filename)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_small_upload_is_a_single_put(fake_s3):
+    await s3_client.s3_upload_file(upload_file(b"small", "book.pdf"), "books/small.pdf")
+    assert [put["Body"] for put in fake_s3.put_objects] == [b"small"]
+    assert not fake_s3.created
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_multipart_upload_parts_have_the_part_size(fake_s3):
+    data = os.urandom(PART_SIZE * 3 + 100)
+    await s3_client.s3_upload_file(upload_file(data, "book.pdf"), "books/big.pdf")
+
+    assert [len(part) for part in fake_s3.parts] == [PART_SIZE, PART_SIZE, PART_SIZE, 100]
+    assert b"".join(fake_s3.parts) == data
+    assert [part["PartNumber"] for part in fake_s3.completed[0]] == [1, 2, 3, 4]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_compressed_upload_is_recut_into_parts(fake_s3):
+    # random bytes barely compress, so the gzip stream still spans several parts
+    data = os.urandom(PART_SIZE * 3)
+    await s3_client.s3_upload_file(upload_file(data, "book.txt"), "books/big.txt")
+
+    assert fake_s3.created == [{"ContentEncoding": "gzip"}]
+    assert all(len(part) == PART_SIZE for part in fake_s3.parts[:-1])
+    assert 0 < len(fake_s3.parts[-1]) <= PART_SIZE
+    assert gzip.decompress(b"".join(fake_s3.parts)) == data
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_multipart_upload_is_aborted_over_the_size_limit(fake_s3, monkeypatch):
+    monkeypatch.setitem(MAX_FILE_SIZES, "pdf", PART_SIZE * 2)
+
+    with pytest.raises(HTTPException):
+        await s3_client.s3_upload_file(upload_file(os.urandom(PART_SIZE * 3), "book.pdf"), "books/huge.pdf")
+    assert fake_s3.aborted == ["upload-id"]
+    assert not fake_s3.completed
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_upload_over_the_request_limit_is_rejected(ac: AsyncClient):
+    # answered from Content-Length, before the body is read
+    response = await ac.post(
+        API_URL, content=b"x", headers={"Content-Length": str(MAX_UPLOAD_REQUEST_SIZE + 1)}
+    )
+    assert response.status_code == 413